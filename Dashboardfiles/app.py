@@ -0,0 +1,27 @@
+import streamlit as st
+
+import warmup
+
+#############################
+# Multipage entry point
+#############################
+
+# One server for every dashboard: `streamlit run app.py`. Pages share the
+# process, so each dataset is loaded (and each chart library imported) once
+# for all of them, and a page only imports what it draws. The page scripts
+# still run on their own with `streamlit run <page>.py`.
+
+st.set_page_config(page_title="Dashboards", layout="wide", initial_sidebar_state="expanded")
+
+page = st.navigation([
+    st.Page("dashboard.py", title="Uber bookings", icon="📊", default=True),
+    st.Page("world-dashboard.py", title="World cities", icon="🌍"),
+    st.Page("chart_elements.py", title="Adidas sales", icon="📈"),
+    st.Page("data_elements.py", title="Data elements", icon="🗂️"),
+    st.Page("widgets.py", title="Widgets", icon="🎛️"),
+])
+page.run()
+
+# Once the first page is on screen: preload the other pages' data and chart
+# libraries in the background (once per server process)
+warmup.start()
@@ -1,12 +1,19 @@
 
 import streamlit as st
 import pandas as pd
-import altair as alt
-import plotly.express as px
 from numpy.random import default_rng as rng
 from datetime import datetime, date
 from datetime import time
-import plotly.figure_factory as ff
+
+from data_loader import dataset_version, rejected_rows
+import datasets
+import histograms
+import scatter_lod
+import timeseries
+from paged_table import paged_table
+from panels import Panels
+import profiling
+import result_cache
 
 ###############################
 # Set up the page configuration
@@ -21,8 +28,126 @@ st.set_page_config(
 # Uploading a csv 
 #############################
 
-df = pd.read_excel('Data/Adidas.xlsx')
-st.write(df.head())
+profiling.start_run()
+
+with profiling.section("load") as span:
+    # Parsed, sorted once per process and shared read-only by every session
+    version = dataset_version(datasets.ADIDAS)   # cache key for derived results
+    df = datasets.load(datasets.ADIDAS, version)
+    rejected = rejected_rows(datasets.ADIDAS, version=version)
+    span.set(rows_out=len(df))
+if len(rejected):
+    with st.expander(f"{len(rejected):,} values rejected while loading Adidas.xlsx"):
+        st.dataframe(rejected, hide_index=True)
+#############################
+# Panel preparation
+#############################
+
+# The panels below don't depend on each other's data, so their frames and
+# figures are prepared on the panel thread pool (see panels.py) while the
+# page renders; each section only waits for its own panel.
+
+SALES_AGGS = (("TotalSales", ("TotalSales", "sum")), ("OperatingProfit", ("OperatingProfit", "sum")))
+
+
+# Group by State and take the maximum PriceperUnit; kept in memory and on
+# disk, so restarted workers don't redo it
+@st.cache_data
+@result_cache.persistent()
+def max_price_by_state(version, _df):
+    return _df.groupby("State", as_index=False, observed=True)["PriceperUnit"].max()
+
+
+@st.cache_data
+@result_cache.persistent()
+def monthly_max(version, _df):
+    # Both monthly maxima in one pass
+    return timeseries.resample(
+        _df, "InvoiceDate",
+        {"UnitsSold": ("UnitsSold", "max"), "PriceperUnit": ("PriceperUnit", "max")},
+        pd.offsets.MonthEnd(),
+    )
+
+
+def sales_histogram(version, df):
+    # Bars and box quartiles computed here on shared edges, instead of
+    # melting every row into the figure and binning in the browser
+    bars, boxes = histograms.cached_histograms(
+        version, ("TotalSales", "OperatingProfit"), 60, None, df,
+        density=True,  # comparable scales
+        box=True,
+    )
+    return histograms.plotly_histogram(bars, boxes, y="density", opacity=0.6), len(bars)
+
+
+def sales_vs_units(df, budget, version):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+
+    # Scatter: Total Sales vs Units Sold
+    df_pts = scatter_lod.thin(df, "UnitsSold", "TotalSales", budget, version)
+    fig.add_trace(
+        scatter_lod.scatter_trace(len(df_pts))(
+            x=df_pts["UnitsSold"],
+            y=df_pts["TotalSales"],
+            mode="markers",
+            text=df_pts["Product"],   # hover tooltip
+            marker=dict(size=10, color=df_pts["OperatingProfit"], colorscale="Viridis", showscale=True)
+        )
+    )
+
+    fig.update_layout(
+        title="Sales vs Units Scatter",
+        xaxis_title="Units Sold",
+        yaxis_title="Total Sales"
+    )
+    return fig
+
+
+def profit_scatter(df, budget, version):
+    import plotly.express as px
+
+    df_pts = scatter_lod.thin(df, "OperatingProfit", "TotalSales", budget, version)
+    fig = px.scatter(df_pts, x="OperatingProfit", y="TotalSales",
+                     render_mode=scatter_lod.render_mode(len(df_pts)))
+    return fig, len(df_pts)
+
+
+def units_scatter(df, budget, version):
+    import plotly.express as px
+
+    df_pts = scatter_lod.thin(df, "UnitsSold", "TotalSales", budget, version)
+    fig = px.scatter(
+        df_pts,
+        x="UnitsSold",
+        y="TotalSales",
+        color="SalesMethod",
+        size="OperatingProfit",
+        hover_data=["OperatingMargin"], 
+        render_mode=scatter_lod.render_mode(len(df_pts)),
+    )
+    return fig, len(df_pts)
+
+
+# Past the budget the scatters get a density-preserving sample of the rows
+# (outliers kept); past a few thousand points they draw with WebGL
+point_budget = scatter_lod.budget_knob()
+
+panels = Panels()
+panels.add("sales_area", timeseries.cached_series, version, "InvoiceDate", SALES_AGGS,
+           None, timeseries.TARGET_POINTS, None, df)
+panels.add("state_max", max_price_by_state, version, df)
+panels.add("top_states", lambda m: m.sort_values("PriceperUnit", ascending=False).head(10),
+           deps=["state_max"])
+panels.add("monthly_max", monthly_max, version, df)
+panels.add("sales_histogram", sales_histogram, version, df)
+panels.add("sales_vs_units", sales_vs_units, df, point_budget, version)
+panels.add("profit_scatter", profit_scatter, df, point_budget, version)
+panels.add("units_scatter", units_scatter, df, point_budget, version)
+
+# Whole dataset, one page at a time (sort / search cached per file version)
+paged_table(df, key="adidas_rows", version=version)
 
 #############################
 # Area Charts
@@ -32,8 +157,12 @@ df1 = pd.DataFrame(rng(0).standard_normal((20, 3)), columns=['A', 'B', 'C'])
 st.area_chart(df1)
 
 
-df = df.sort_values("InvoiceDate")
-st.area_chart(df.set_index("InvoiceDate")[["TotalSales", "OperatingProfit"]])
+with profiling.section("sales_area", rows_in=len(df)) as span:
+    # Summed per day/week/... (picked from the date span), at most
+    # TARGET_POINTS points instead of one per invoice row
+    sales_area, _ = panels.result("sales_area")
+    span.set(rows_out=len(sales_area), payload=sales_area, prepare_ms=panels.prepare_ms("sales_area"))
+    st.area_chart(sales_area)
                                                                              
 #############################
 # Bar Charts
@@ -41,8 +170,8 @@ st.area_chart(df.set_index("InvoiceDate")[["TotalSales", "OperatingProfit"]])
 
 # Suppose you already read your CSV
 
-# Group by State and take the maximum PriceperUnit
-df_max = df.groupby("State", as_index=False)["PriceperUnit"].max()
+# Maximum PriceperUnit per State (the "state_max" panel)
+df_max = panels.result("state_max")
 
 # Set State as index for plotting
 df_max = df_max.set_index("State")
@@ -51,16 +180,10 @@ df_max = df_max.set_index("State")
 st.bar_chart(df_max)
 
 # Top 2 
-# Step 1: Group by State and take max PriceperUnit
-df_max = df.groupby("State", as_index=False)["PriceperUnit"].max()
-
-# Step 2: Sort by PriceperUnit descending
-df_max = df_max.sort_values("PriceperUnit", ascending=False)
-
-# Step 3: Keep only top 2
-df_top2 = df_max.head(10)
+# States sorted by max PriceperUnit, top ones kept (the "top_states" panel)
+df_top2 = panels.result("top_states")
 
-# Step 4: Set State as index for plotting
+# Set State as index for plotting
 df_top2 = df_top2.set_index("State")
 
 # Plot
@@ -71,19 +194,20 @@ st.bar_chart(df_top2)
 
 # source = data.barley()
 
-st.bar_chart(df, x="Product", y="UnitsSold", color="SalesMethod", horizontal=True)
+with profiling.section("units_by_product", rows_in=len(df)) as span:
+    if profiling.enabled():
+        # The chart's columns, sliced only when they are being measured
+        span.set(payload=df[["Product", "UnitsSold", "SalesMethod"]])
+    st.bar_chart(df, x="Product", y="UnitsSold", color="SalesMethod", horizontal=True)
 
 #############################
 # Line Charts
 #############################
 
-df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], errors="coerce")
-df = df.sort_values("InvoiceDate")
-
-graph_sales = df.resample("M", on="InvoiceDate")["UnitsSold"].max()
-graph_sales_1 = df.resample("M", on="InvoiceDate")["PriceperUnit"].max()
-combined_df = pd.concat([graph_sales, graph_sales_1], axis=1)
-st.line_chart(combined_df)
+with profiling.section("monthly_max", rows_in=len(df)) as span:
+    combined_df = panels.result("monthly_max")
+    span.set(rows_out=len(combined_df), payload=combined_df, prepare_ms=panels.prepare_ms("monthly_max"))
+    st.line_chart(combined_df)
 
 
 #############################
@@ -116,7 +240,6 @@ dfsd = pd.DataFrame(
 st.map(dfsd, latitude="col1", longitude="col2", size="col3", color = "col4", zoom=10)
 
 import streamlit as st
-import pydeck as pdk
 import pandas as pd
 import numpy as np
 
@@ -131,6 +254,9 @@ df33 = pd.DataFrame({
 #Altair scatter plot
 #############################
 
+# Chart libraries are imported where they are first drawn, so the sections
+# above reach the browser before altair / plotly load
+import altair as alt
 
 df22 = pd.DataFrame({
     "Retailer": ["A", "B", "C", "D", "E"],
@@ -177,60 +303,35 @@ st.altair_chart(chart, theme=None, use_container_width=True)
 # Histograms
 #############################
 
-df_melt = df.melt(
-    value_vars=["TotalSales","OperatingProfit"],
-    var_name="Metric", value_name="Value"
-)
-fig = px.histogram(
-    df_melt, x="Value", color="Metric",
-    barmode="overlay", opacity=0.6, nbins=60,
-    histnorm="probability density",  # comparable scales
-    marginal="box")
-st.plotly_chart(fig, use_container_width=True)
+with profiling.section("sales_histogram", rows_in=len(df)) as span:
+    fig, n_bars = panels.result("sales_histogram")
+    span.set(rows_out=n_bars, payload=fig, prepare_ms=panels.prepare_ms("sales_histogram"))
+    st.plotly_chart(fig, use_container_width=True)
 
 
 #############################
 #Plotly Chart with configuratio
 #############################
-import plotly.graph_objects as go   
 
-fig = go.Figure()
+with profiling.section("sales_vs_units", rows_in=len(df)) as span:
+    fig = panels.result("sales_vs_units")
+    span.set(payload=fig, prepare_ms=panels.prepare_ms("sales_vs_units"))
+    st.plotly_chart(fig, config={'scrollZoom': True})
 
-# Scatter: Total Sales vs Units Sold
-fig.add_trace(
-    go.Scatter(
-        x=df["UnitsSold"],
-        y=df["TotalSales"],
-        mode="markers",
-        text=df["Product"],   # hover tooltip
-        marker=dict(size=10, color=df["OperatingProfit"], colorscale="Viridis", showscale=True)
-    )
-)
-
-fig.update_layout(
-    title="Sales vs Units Scatter",
-    xaxis_title="Units Sold",
-    yaxis_title="Total Sales"
-)
-
-st.plotly_chart(fig, config={'scrollZoom': True})
 
 
 
+with profiling.section("profit_scatter", rows_in=len(df)) as span:
+    fig, n_points = panels.result("profit_scatter")
+    span.set(rows_out=n_points, payload=fig, prepare_ms=panels.prepare_ms("profit_scatter"))
 
-fig = px.scatter(df, x="OperatingProfit", y="TotalSales")
+    event = st.plotly_chart(fig, key="iris", on_select="rerun")
 
-event = st.plotly_chart(fig, key="iris", on_select="rerun")
 
+with profiling.section("units_scatter", rows_in=len(df)) as span:
+    fig, n_points = panels.result("units_scatter")
+    span.set(rows_out=n_points, payload=fig, prepare_ms=panels.prepare_ms("units_scatter"))
 
-fig = px.scatter(
-    df,
-    x="UnitsSold",
-    y="TotalSales",
-    color="SalesMethod",
-    size="OperatingProfit",
-    hover_data=["OperatingMargin"], 
-)
-
-event = st.plotly_chart(fig)
+    event = st.plotly_chart(fig)
 
+profiling.debug_panel()
@@ -1,7 +1,13 @@
 import streamlit as st 
 import pandas as pd 
-import plotly.express as px
-import altair as alt
+
+from data_loader import dataset_version, rejected_rows
+import datasets
+import histograms
+from ranking_index import get_ranking_index
+import rollup
+import timeseries
+import profiling
 
 st.set_page_config(
     page_title="Uber Dashboard",
@@ -11,13 +17,27 @@ st.set_page_config(
 )
 
 
-df = pd.read_csv('newuber.csv')
-
-with st.container(border=True):
-    count_booking = df['booking_id'].nunique()
-    max_customer_rating = df['customer_rating'].mean()
-    avg_booking_price = df['booking_value'].mean()
-    vehicle_types = df['vehicle_type'].nunique()
+profiling.start_run()
+
+with profiling.section("load") as span:
+    # the version the background refresher last published, fixed for this rerun
+    version = dataset_version(datasets.UBER)
+    # read-only and shared by every session (no per-session copy)
+    df = datasets.load(datasets.UBER, version)
+    rejected = rejected_rows(datasets.UBER, version=version)
+    # sums / counts per (day, vehicle, payment, reasons), built once per file version
+    cube = rollup.load_uber_rollup(datasets.UBER, version)
+    span.set(rows_out=len(cube))
+if len(rejected):
+    with st.expander(f"{len(rejected):,} values rejected while loading newuber.csv"):
+        st.dataframe(rejected, hide_index=True)
+
+with st.container(border=True), profiling.section("kpis", rows_in=len(cube)):
+    kpi = rollup.kpis(cube, df)
+    count_booking = kpi['unique_bookings']
+    max_customer_rating = kpi['avg_rating']
+    avg_booking_price = kpi['avg_booking_value']
+    vehicle_types = kpi['vehicle_types']
 
     col1, col2,col3, col4 = st.columns(4)
 
@@ -29,15 +49,10 @@ with st.container(border=True):
 
 col1, col2 = st.columns(2)
 with col1: 
-    with st.container(border=True):
+    with st.container(border=True), profiling.section("avg_rating_by_vehicle", rows_in=len(cube)) as span:
         
-        df['customer_rating'] = pd.to_numeric(df['customer_rating'])
-        avg_by_type = (
-            df.groupby(['vehicle_type'], as_index=False)['customer_rating']
-            .mean()
-            .rename(columns={'customer_rating': 'avg_rating'})
-            .sort_values('avg_rating', ascending = True)
-        )
+        avg_by_type = rollup.avg_rating_by_vehicle(cube)
+        span.set(rows_out=len(avg_by_type), payload=avg_by_type)
 
 
         st.bar_chart(
@@ -48,16 +63,14 @@ with col1:
        
 
     with col2:
-        with st.container(border=True):
-            # Ensure "date" is datetime
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
+        with st.container(border=True), profiling.section("bookings_per_day", rows_in=len(cube)) as span:
             # Count bookings per day
-            bookings_over_time = (
-                df.groupby(df["date"].dt.date)["booking_id"]
-                .count()
-                .reset_index(name="bookings")
-            )
+            bookings_over_time = rollup.bookings_per_day(cube)
+            # LTTB keeps at most TARGET_POINTS days, spikes included
+            bookings_over_time = timeseries.downsample(
+                bookings_over_time.set_index("date"), ["bookings"]
+            ).reset_index()
+            span.set(rows_out=len(bookings_over_time), payload=bookings_over_time)
 
             # Plot line chart
             st.line_chart(
@@ -67,32 +80,38 @@ with col1:
             )
 
 col1, col2 = st.columns(2)
-with col1: 
+with col1, profiling.section("cancellation_reasons", rows_in=len(cube)): 
     tab1, tab2 = st.tabs(["Customer", "Driver"])
 
 
     with tab1:
         with st.container():
             st.table(
-                pd.DataFrame(df['reason_for_cancelling_by_customer'].unique(),
+                pd.DataFrame(rollup.unique_values(cube, 'reason_for_cancelling_by_customer'),
                 columns=['Cancellation Reason by Customer']
             ))
     with tab2:
         with st.container():
             st.table(
-                pd.DataFrame(df['driver_cancellation_reason'].unique(),
+                pd.DataFrame(rollup.unique_values(cube, 'driver_cancellation_reason'),
                 columns=['Cancellation Reason by Driver']
             ))
 
 with col2:
-        with st.container(border = True):
-            st.bar_chart(df, x="vehicle_type", y="cancelled_rides_by_customer", color="reason_for_cancelling_by_customer", horizontal=True)
+        with st.container(border = True), profiling.section("cancellations_by_vehicle", rows_in=len(cube)) as span:
+            cancellations = rollup.customer_cancellations_by_vehicle(cube)
+            span.set(rows_out=len(cancellations), payload=cancellations)
+            st.bar_chart(cancellations, x="vehicle_type", y="cancelled_rides_by_customer", color="reason_for_cancelling_by_customer", horizontal=True)
 
 
 
 col1, col2 = st.columns(2)
 
-top10 = df.nlargest(1000, "booking_value")   # by largest values
+with profiling.section("top_booking_values", rows_in=len(df)) as span:
+    # by largest values: the front of the booking_value order, sorted once per file version
+    ranking = get_ranking_index("uber_booking_value", version, None, df["booking_value"].to_numpy())
+    top10 = df.iloc[ranking.top(1000)]
+    span.set(rows_out=len(top10), payload=top10)
 
 with col1:
     with st.container(border=True):
@@ -104,37 +123,48 @@ with col1:
 )
 
 with col2: 
-    with st.container(border=True):
-        df["cutomer_rating"] = pd.to_numeric(df['customer_rating'])
-        avg_by_payment = (
-        df.groupby(['payment_method'], as_index=False)['customer_rating']
-        .count()
-        .rename(columns={'customer_rating': 'count_customer_rating'})
-        .sort_values('count_customer_rating', ascending = True)
-        )
+    with st.container(border=True), profiling.section("rating_count_by_payment", rows_in=len(cube)) as span:
+        avg_by_payment = rollup.rating_count_by_payment(cube)
+        span.set(rows_out=len(avg_by_payment), payload=avg_by_payment)
         st.bar_chart(
         avg_by_payment,
         x="payment_method",
         y=["count_customer_rating"]
 )
 
-filtered = df.copy()
-chart_kind = st.selectbox("Chart type", ["Bar", "Line"])
-grouped = (
-    filtered.groupby("vehicle_type", as_index=False)["booking_value"].count().rename(columns={"booking_value":"avg_value"})
-)
-if chart_kind == "Bar":
-    st.bar_chart(grouped, x="vehicle_type", y="avg_value")
-else:
-    st.line_chart(grouped, x="vehicle_type", y="avg_value")
+filtered = df
 
 
+# The two controls below only affect their own chart, so each section is a
+# fragment: changing it reruns that section alone, not the whole dashboard.
+
+@st.fragment
+@profiling.profiled("vehicle_chart")
+def vehicle_chart_section(cube):
+    chart_kind = st.selectbox("Chart type", ["Bar", "Line"])
+    grouped = rollup.booking_count_by_vehicle(cube)
+    if chart_kind == "Bar":
+        st.bar_chart(grouped, x="vehicle_type", y="avg_value")
+    else:
+        st.line_chart(grouped, x="vehicle_type", y="avg_value")
+
+
+vehicle_chart_section(cube)
+
+
+@st.fragment
+def booking_histogram_section(filtered, filter_key=None):
+    bins = st.slider("Bins for booking value", 5, 100, 30)
+    with profiling.section("booking_histogram", rows_in=len(filtered)) as span:
+        # Binned here; the chart gets one row per bar instead of every booking
+        bars, _ = histograms.cached_histograms(
+            version, ("booking_value",), bins, filter_key, filtered
+        )
+        hist = histograms.altair_bars(bars, title="booking_value (binned)")
+        span.set(rows_out=len(bars), payload=hist)
+        st.altair_chart(hist, use_container_width=True)
 
-bins = st.slider("Bins for booking value", 5, 100, 30)
-hist = alt.Chart(filtered).mark_bar().encode(
-    x=alt.X("booking_value:Q", bin=alt.Bin(maxbins=bins)),
-    y="count()"
-)
-st.altair_chart(hist, use_container_width=True)
 
+booking_histogram_section(filtered)
 
+profiling.debug_panel()
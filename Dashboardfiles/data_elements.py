@@ -1,8 +1,6 @@
 
 import streamlit as st
 import pandas as pd
-import altair as alt
-import plotly.express as px
 from numpy.random import default_rng as rng
 from datetime import datetime, date
 from datetime import time
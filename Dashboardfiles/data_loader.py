@@ -0,0 +1,539 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import types
+
+import numpy as np
+
+import pandas as pd
+import streamlit as st
+
+import schemas
+
+#############################
+# Snapshot cache
+#############################
+
+# Parsed sources are written once as Arrow IPC (feather) files so later
+# reruns and restarts skip the csv / excel parse entirely.
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", ".data_cache")
+
+# Part of every snapshot key; bump it when parsing or dtype compaction
+# changes, so snapshots written by older code are not read back
+SNAPSHOT_FORMAT = 4
+
+
+def file_key(path):
+    """Identify a source file by its absolute path, mtime and size."""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def snapshot_path(path, mtime_ns, size, options=()):
+    """Where the columnar snapshot for this version of `path` lives."""
+    # Different load options get their own snapshot (and stale-file cleanup)
+    source = hashlib.sha1(f"{path}|{options}".encode()).hexdigest()[:8]
+    version = hashlib.sha1(f"{mtime_ns}|{size}".encode()).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}-{source}-{version}.arrow")
+
+
+def read_source(path, **read_kwargs):
+    """Parse the raw file with the reader that matches its extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(path, **read_kwargs)
+    if ext == ".parquet":
+        return pd.read_parquet(path, **read_kwargs)
+    if ext in (".arrow", ".feather"):
+        return pd.read_feather(path, **read_kwargs)
+    return pd.read_csv(path, **read_kwargs)
+
+
+#############################
+# Compact dtypes
+#############################
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _compact_column(col, max_category_ratio):
+    if col.dtype == object:
+        n = col.notna().sum()
+        if n and pd.api.types.infer_dtype(col, skipna=True) == "string":
+            if col.nunique() <= max_category_ratio * n:
+                return col.astype("category")
+        return col
+
+    if pd.api.types.is_integer_dtype(col):
+        kind = "unsigned" if len(col) and col.min() >= 0 else "integer"
+        return pd.to_numeric(col, downcast=kind)
+
+    if pd.api.types.is_float_dtype(col):
+        values = col.to_numpy()
+        # Whole numbers without gaps (e.g. counts read as float) become ints,
+        # as long as every value is finite and fits in int64
+        if (len(values) and np.isfinite(values).all()
+                and values.min() >= -2.0 ** 63 and values.max() < 2.0 ** 63
+                and np.all(values == np.round(values))):
+            ints = col.astype("int64")
+            return pd.to_numeric(ints, downcast="unsigned" if ints.min() >= 0 else "integer")
+        # float32 only when every value survives the round trip exactly;
+        # anything float32 would round (most prices, large totals) stays float64
+        with np.errstate(over="ignore"):
+            small = values.astype("float32")
+        if np.all((small.astype("float64") == values) | (np.isnan(small) & np.isnan(values))):
+            return col.astype("float32")
+    return col
+
+
+def optimize_dtypes(df, max_category_ratio=CATEGORY_MAX_RATIO):
+    """
+    Shrink a frame: low-cardinality text -> category, numerics downcast
+    where the value range allows.
+
+    Returns (compact frame, report) where the report has one row per column
+    with the dtype and deep memory usage before and after.
+    """
+    compact = pd.DataFrame(
+        {name: _compact_column(df[name], max_category_ratio) for name in df.columns},
+        index=df.index,
+    )
+    report = pd.DataFrame({
+        "dtype_before": df.dtypes.astype(str),
+        "dtype_after": compact.dtypes.astype(str),
+        "bytes_before": df.memory_usage(deep=True, index=False),
+        "bytes_after": compact.memory_usage(deep=True, index=False),
+    })
+    report.index.name = "column"
+    return compact, report
+
+
+def _report_path(target):
+    return target[: -len(".arrow")] + ".dtypes.json"
+
+
+def _rejected_path(target):
+    return target[: -len(".arrow")] + ".rejected.json"
+
+
+def _snapshot_target(path, mtime_ns, size, optimize, read_kwargs):
+    # A declared schema is part of the key: editing it re-parses the file
+    options = (SNAPSHOT_FORMAT, optimize, read_kwargs)
+    if optimize:
+        options += (CATEGORY_MAX_RATIO,)
+    fields = schemas.schema_for(path)
+    if fields is not None:
+        options += (fields,)
+    return snapshot_path(path, mtime_ns, size, options)
+
+
+def _write_snapshot(df, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.tmp"
+    # feather needs a default index, same as what read_csv / read_excel give us
+    df.reset_index(drop=True).to_feather(tmp, compression="uncompressed")
+    os.replace(tmp, target)
+
+
+def _drop_stale_snapshots(target):
+    # Older versions of the same source are never read again
+    prefix = os.path.basename(target).rsplit("-", 1)[0] + "-"
+    for name in os.listdir(os.path.dirname(target)):
+        if name.startswith(prefix) and name.endswith((".arrow", ".dtypes.json", ".rejected.json")):
+            old = os.path.join(os.path.dirname(target), name)
+            if old not in (target, _report_path(target), _rejected_path(target)):
+                os.remove(old)
+
+
+def _materialize(path, mtime_ns, size, optimize, read_kwargs, memory_map=False):
+    """Read the snapshot for this version of `path`, creating it if needed."""
+    target = _snapshot_target(path, mtime_ns, size, optimize, read_kwargs)
+    if os.path.exists(target):
+        if memory_map:
+            import pyarrow.feather as feather
+
+            # Numeric columns without nulls stay backed by the mapped file
+            table = feather.read_table(target, memory_map=True)
+            return table.to_pandas(split_blocks=True)
+        return pd.read_feather(target)
+
+    fields = schemas.schema_for(path)
+    rejected = None
+    if fields is None:
+        df = read_source(path, **dict(read_kwargs))
+    else:
+        # Typed parse against the declared schema; bad rows are reported
+        df, rejected = schemas.read_typed(path, fields, reader=read_source, **dict(read_kwargs))
+        if len(rejected):
+            logging.getLogger("dashboard.ingest").warning(
+                "%s: %d values rejected at ingest", path, len(rejected))
+    report = None
+    if optimize:
+        df, report = optimize_dtypes(df)
+    try:
+        _write_snapshot(df, target)
+        if report is not None:
+            report.to_json(_report_path(target), orient="index", indent=1)
+        if rejected is not None:
+            rejected.to_json(_rejected_path(target), orient="records", indent=1)
+        _drop_stale_snapshots(target)
+    except (ImportError, ValueError, TypeError, OSError):
+        # No pyarrow, a column feather can't store, or a read-only disk:
+        # keep the parsed frame in memory only.
+        pass
+    return df
+
+
+@st.cache_data(show_spinner="Loading data...", max_entries=8)
+def _load_snapshot(path, mtime_ns, size, optimize, read_kwargs):
+    return _materialize(path, mtime_ns, size, optimize, read_kwargs)
+
+
+def load_dataset(path, optimize=True, **read_kwargs):
+    """
+    Load `path` as a DataFrame, parsing the raw file only once per version.
+
+    The first call converts the source into an Arrow snapshot keyed on
+    path + mtime + size; every later call (and every rerun) is served from
+    Streamlit's cache or, after a restart, from the snapshot on disk.
+    Editing or replacing the source file produces a new key automatically.
+    With `optimize` the snapshot stores compact dtypes (see `optimize_dtypes`).
+
+    Every call returns a private copy; use `load_shared` for a frame that
+    is only read.
+    """
+    abs_path, mtime_ns, size = file_key(path)
+    return _load_snapshot(abs_path, mtime_ns, size, optimize, tuple(sorted(read_kwargs.items())))
+
+
+#############################
+# Shared read-only datasets
+#############################
+
+class ReadOnlyDatasetError(RuntimeError):
+    """Raised when code tries to modify a shared dataset in place."""
+
+
+def _refuse(*args, **kwargs):
+    raise ReadOnlyDatasetError(
+        "This dataset is shared across sessions and is read-only; "
+        "derive a new frame (e.g. df.assign(...)) instead of modifying it."
+    )
+
+
+def _not_inplace(method):
+    # Checked before pandas does any work: some inplace paths (rename)
+    # change the frame's axes before reaching `_update_inplace`
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if kwargs.get("inplace"):
+            _refuse()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# DataFrame methods that take inplace=True
+_INPLACE_METHODS = (
+    "rename", "rename_axis", "reset_index", "set_index", "set_axis", "drop",
+    "dropna", "drop_duplicates", "fillna", "ffill", "bfill", "replace",
+    "interpolate", "clip", "where", "mask", "sort_values", "sort_index",
+    "query", "eval",
+)
+
+
+class FrozenFrame(pd.DataFrame):
+    """
+    A DataFrame that is shared by every session and must never change.
+
+    Column assignment, replacing `columns` / `index` and `inplace=True`
+    operations raise, and the backing arrays are marked read-only so cell
+    writes (`.loc[...] = x`) fail too. Anything derived from it (filters,
+    `.assign`, `.copy()`, groupbys) is an ordinary DataFrame, so sessions
+    build views and small results freely.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def __setattr__(self, name, value):
+        if name in ("columns", "index"):
+            _refuse()
+        super().__setattr__(name, value)
+
+    __setitem__ = _refuse
+    __delitem__ = _refuse
+    insert = _refuse
+    _update_inplace = _refuse
+
+
+for _name in _INPLACE_METHODS:
+    setattr(FrozenFrame, _name, _not_inplace(getattr(pd.DataFrame, _name)))
+
+
+def freeze(df):
+    """Wrap `df` as a FrozenFrame and mark its arrays read-only (no copy)."""
+    frozen = FrozenFrame(df)
+    # pandas has no public hook for this, so walk the column blocks
+    for block in frozen._mgr.blocks:
+        values = block.values
+        array = values if isinstance(values, np.ndarray) else getattr(values, "_ndarray", None)
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
+    return frozen
+
+
+@st.cache_resource(show_spinner="Loading data...", max_entries=8)
+def _shared_snapshot(path, mtime_ns, size, optimize, read_kwargs, prepare_key, _prepare):
+    df = _materialize(path, mtime_ns, size, optimize, read_kwargs, memory_map=True)
+    if _prepare is not None:
+        df = _prepare(df)
+    return freeze(df)
+
+
+def _hash_code(code, digest):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        # Nested functions / lambdas by their own body: the repr of a code
+        # object holds its memory address, which differs between processes
+        if isinstance(const, types.CodeType):
+            _hash_code(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def _function_key(func):
+    # Streamlit can't hash functions; key on name + compiled body instead so
+    # editing the prepare step still invalidates the shared frame
+    if func is None:
+        return None
+    digest = hashlib.sha1()
+    _hash_code(func.__code__, digest)
+    return func.__qualname__, digest.hexdigest()
+
+
+def load_shared(path, prepare=None, optimize=True, version=None, **read_kwargs):
+    """
+    One read-only copy of `path` per process, shared by every session.
+
+    Like `load_dataset`, but served from `st.cache_resource` straight off a
+    memory-mapped snapshot, so memory does not grow with the number of
+    sessions. `prepare` (a module-level function taking and returning a
+    frame) runs once per file version before the frame is frozen; use it
+    for tidy-up steps that would otherwise copy the data on every rerun.
+
+    Sessions get the version the background refresher last published (see
+    `dataset_version`); pass that key as `version` to keep the frame and
+    anything cached on the key in step within one rerun.
+    """
+    options = (optimize, tuple(sorted(read_kwargs.items())), _function_key(prepare), prepare)
+    if version is None:
+        version = dataset_version(path)
+    df = _shared_snapshot(*version, *options)
+    refresher = get_refresher()
+    if refresher is not None:
+        refresher.watch(version[0], options, df.columns)
+    return df
+
+
+#############################
+# Background refresh
+#############################
+
+# Seconds between checks of the watched files; 0 turns the refresher off and
+# every rerun picks up a changed file (and pays its reload) straight away.
+REFRESH_SECONDS = float(os.environ.get("DASHBOARD_REFRESH_SECONDS", 30))
+
+logger = logging.getLogger("dashboard.refresh")
+
+
+def check_refreshed(df, columns):
+    """Reject a reloaded frame that is empty or lost columns it had before."""
+    if df.empty:
+        raise ValueError("no rows")
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"missing columns {missing}")
+
+
+class DatasetRefresher:
+    """
+    Reloads shared datasets in a background thread when their files change.
+
+    Sessions are served the last *published* version of each file. The
+    thread polls the files; once a changed file has kept the same mtime and
+    size for two polls (so a half-written file is never read), it builds the
+    new shared frames and runs the refresh hooks (warm caches), checks the
+    result with `check_refreshed`, and only then publishes the new key.
+    Reruns already in flight keep the frame they hold; if anything fails
+    the old version stays published and the error is logged.
+    """
+
+    def __init__(self, interval=REFRESH_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._published = {}   # abs path -> file key sessions are served
+        self._options = {}     # abs path -> {options key: load_shared options}
+        self._columns = {}     # (abs path, options key) -> columns last published
+        self._hooks = {}       # abs path -> {name: callback(file key)}
+        self._seen = {}        # abs path -> key seen on the previous poll
+        self._failed = {}      # abs path -> key that failed to load
+        self._stop = threading.Event()
+        self._thread = None
+
+    def version(self, path):
+        """Published file key of `path`, publishing the current file on first use."""
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            if abs_path not in self._published:
+                self._published[abs_path] = file_key(abs_path)
+                self._start()
+            return self._published[abs_path]
+
+    def watch(self, abs_path, options, columns):
+        """Reload `abs_path` with these `load_shared` options when it changes."""
+        with self._lock:
+            self._options.setdefault(abs_path, {}).setdefault(options[:3], options)
+            self._columns.setdefault((abs_path, options[:3]), list(columns))
+
+    def on_refresh(self, path, callback):
+        """Run `callback(file key)` in the background before a new version is published."""
+        with self._lock:
+            self._hooks.setdefault(os.path.abspath(path), {})[callback.__qualname__] = callback
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="dataset-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """One check of every watched file (the thread calls this every `interval`)."""
+        with self._lock:
+            published = dict(self._published)
+        for abs_path, current in published.items():
+            try:
+                key = file_key(abs_path)
+            except OSError:
+                continue   # being replaced right now
+            if key == current or key == self._failed.get(abs_path):
+                self._seen.pop(abs_path, None)
+                continue
+            if self._seen.get(abs_path) != key:
+                # Changed since the last poll: wait until it settles
+                self._seen[abs_path] = key
+                continue
+            self._refresh(abs_path, key)
+
+    def _refresh(self, abs_path, key):
+        with self._lock:
+            options = list(self._options.get(abs_path, {}).values())
+            expected = {o[:3]: self._columns.get((abs_path, o[:3]), []) for o in options}
+            hooks = list(self._hooks.get(abs_path, {}).values())
+        try:
+            columns = {}
+            for option in options:
+                frame = _shared_snapshot(*key, *option)
+                check_refreshed(frame, expected[option[:3]])
+                columns[option[:3]] = list(frame.columns)
+            for hook in hooks:
+                hook(key)
+        except Exception:
+            self._failed[abs_path] = key
+            logger.exception("Keeping the current version of %s, reload failed", abs_path)
+            return
+
+        with self._lock:
+            self._published[abs_path] = key
+            for option_key, names in columns.items():
+                self._columns[(abs_path, option_key)] = names
+        self._seen.pop(abs_path, None)
+        self._failed.pop(abs_path, None)
+        logger.info("Published new version of %s", abs_path)
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def get_refresher():
+    """The process-wide refresher, or None when DASHBOARD_REFRESH_SECONDS is 0."""
+    global _refresher
+    if REFRESH_SECONDS <= 0:
+        return None
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = DatasetRefresher(REFRESH_SECONDS)
+        return _refresher
+
+
+def dataset_version(path):
+    """
+    File key of the version of `path` sessions should use right now: the
+    one the refresher last published, or the file as it is when refresh is off.
+    Read it once per rerun and pass it to `load_shared(..., version=...)`
+    and to caches keyed on the dataset.
+    """
+    refresher = get_refresher()
+    return file_key(path) if refresher is None else refresher.version(path)
+
+
+def on_refresh(path, callback):
+    """Warm a derived cache for a new version of `path` before it goes live."""
+    refresher = get_refresher()
+    if refresher is not None:
+        refresher.on_refresh(path, callback)
+
+
+def dtype_report(path, **read_kwargs):
+    """Before/after memory per column for the current snapshot of `path`."""
+    abs_path, mtime_ns, size = file_key(path)
+    target = _snapshot_target(abs_path, mtime_ns, size, True, tuple(sorted(read_kwargs.items())))
+    report_file = _report_path(target)
+    if not os.path.exists(report_file):
+        return optimize_dtypes(read_source(path, **read_kwargs))[1]
+    with open(report_file) as f:
+        return pd.DataFrame.from_dict(json.load(f), orient="index").rename_axis("column")
+
+
+@st.cache_data(max_entries=8)
+def _rejected_rows(path, mtime_ns, size, optimize, read_kwargs):
+    target = _snapshot_target(path, mtime_ns, size, optimize, read_kwargs)
+    try:
+        rejected = pd.read_json(_rejected_path(target), orient="records", dtype=False)
+        return schemas.rejected_frame(rejected.reindex(columns=schemas.REJECTED_COLUMNS).itertuples(index=False))
+    except (ValueError, OSError):
+        return schemas.rejected_frame()
+
+
+def rejected_rows(path, version=None, optimize=True, **read_kwargs):
+    """
+    Rows dropped while parsing this version of `path` against its declared
+    schema (see `schemas`): row position or file line, column, raw value
+    and reason.
+    Empty when nothing was rejected or the dataset has no schema.
+    """
+    path, mtime_ns, size = version or file_key(path)
+    return _rejected_rows(path, mtime_ns, size, optimize, tuple(sorted(read_kwargs.items())))
+
+
+if __name__ == "__main__":
+    import sys
+
+    for source in sys.argv[1:]:
+        report = dtype_report(source)
+        before, after = report["bytes_before"].sum(), report["bytes_after"].sum()
+        print(f"{source}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+        print(report.to_string())
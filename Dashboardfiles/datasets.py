@@ -0,0 +1,43 @@
+from data_loader import dataset_version, load_shared
+
+#############################
+# Shared data layer
+#############################
+
+# Every page loads its dataset through `load`, whether it runs on its own
+# (`streamlit run world-dashboard.py`) or as a page of app.py. Inside one
+# server process all pages then share a single read-only frame per file,
+# and warmup.py preloads exactly the frames the pages will ask for.
+
+UBER = "newuber.csv"
+WORLD = "worldnew.csv"
+ADIDAS = "Data/Adidas.xlsx"
+
+
+def tidy_world(df):
+    # If CSV has an extra index col
+    if "Unnamed: 0" in df.columns:
+        df = df.drop(columns=["Unnamed: 0"])
+    # lat / lng / population arrive as floats; rows missing them were
+    # rejected at ingest (see schemas.py)
+    return df
+
+
+def by_invoice_date(df):
+    # InvoiceDate is parsed at ingest (see schemas.py)
+    return df.sort_values("InvoiceDate").reset_index(drop=True)
+
+
+# Step run once per file version before the shared frame is frozen
+PREPARE = {
+    UBER: None,
+    WORLD: tidy_world,
+    ADIDAS: by_invoice_date,
+}
+
+
+def load(path, version=None):
+    """Shared frame of one of the datasets above (see `load_shared`)."""
+    if version is None:
+        version = dataset_version(path)
+    return load_shared(path, prepare=PREPARE[path], version=version)
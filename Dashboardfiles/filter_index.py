@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+#############################
+# Sidebar filter index
+#############################
+
+
+class FilterIndex:
+    """
+    Precomputed lookups for "category in selection and value in range".
+
+    Built once per dataset:
+      - categories are factorized (sorted) into integer codes, with the row
+        positions of every category stored contiguously (`offsets` into
+        `rows_by_code`)
+      - a permutation that sorts rows by value, so a range is two
+        searchsorted calls
+
+    `select` returns sorted row positions, which can go straight into
+    `df.iloc[...]` or into any index built over the same rows.
+    """
+
+    def __init__(self, categories, values):
+        codes, uniques = pd.factorize(pd.Series(categories), sort=True)
+        self.codes = codes
+        self.categories = list(uniques)
+        self.code_of = {name: i for i, name in enumerate(self.categories)}
+
+        # Rows grouped by category code; missing categories (code -1) sort first
+        self.rows_by_code = np.argsort(codes, kind="stable")
+        self.offsets = np.searchsorted(codes[self.rows_by_code], np.arange(len(self.categories) + 1))
+
+        self.values = np.asarray(values, dtype="float64")
+        self.value_order = np.argsort(self.values, kind="stable")
+        self.sorted_values = self.values[self.value_order]
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def value_range(self):
+        valid = self.sorted_values[~np.isnan(self.sorted_values)]
+        if not len(valid):
+            return 0.0, 0.0
+        return float(valid[0]), float(valid[-1])
+
+    def select(self, selected, lo, hi):
+        """Sorted row positions with category in `selected` and lo <= value <= hi."""
+        wanted = np.zeros(len(self.categories), dtype=bool)
+        wanted[[self.code_of[c] for c in selected if c in self.code_of]] = True
+
+        start = np.searchsorted(self.sorted_values, lo, side="left")
+        stop = np.searchsorted(self.sorted_values, hi, side="right")
+        in_range = stop - start
+        sizes = np.diff(self.offsets)
+        in_categories = int(sizes[wanted].sum())
+
+        # Start from whichever side of the filter is smaller, check the other
+        if in_range <= in_categories:
+            rows = self.value_order[start:stop]
+            codes = self.codes[rows]
+            rows = rows[(codes >= 0) & wanted[codes]]
+        else:
+            chunks = [self.rows_by_code[self.offsets[c]:self.offsets[c + 1]] for c in np.flatnonzero(wanted)]
+            rows = np.concatenate(chunks) if chunks else np.empty(0, dtype="int64")
+            vals = self.values[rows]
+            rows = rows[(vals >= lo) & (vals <= hi)]
+        return np.sort(rows)
+
+    def categories_in(self, rows):
+        """Sorted category names present among `rows`."""
+        codes = np.unique(self.codes[rows])
+        return [self.categories[c] for c in codes if c >= 0]
+
+    def mask(self, rows):
+        """Boolean mask over all rows for a selection from `select`."""
+        out = np.zeros(len(self), dtype=bool)
+        out[rows] = True
+        return out
+
+
+@st.cache_resource(max_entries=4)
+def get_filter_index(version, _categories, _values):
+    """One filter index per dataset version, shared by every session."""
+    return FilterIndex(_categories, _values)
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+#############################
+# Server-side binning for pydeck density layers
+#############################
+
+# Instead of shipping every city (with its name/country strings) to the
+# browser and letting deck.gl aggregate, cities are binned here and the
+# layers only receive one row per occupied cell.
+
+EARTH_RADIUS_M = 6_378_137.0
+MAX_MERCATOR_LAT = 85.051129
+
+# Same six-step ramp deck.gl's HexagonLayer uses by default
+HEX_COLORS = np.array([
+    [255, 255, 178],
+    [254, 217, 118],
+    [254, 178, 76],
+    [253, 141, 60],
+    [240, 59, 32],
+    [189, 0, 38],
+])
+
+
+def to_mercator(lat, lng):
+    lat = np.clip(np.asarray(lat, dtype="float64"), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+    x = EARTH_RADIUS_M * np.radians(np.asarray(lng, dtype="float64"))
+    y = EARTH_RADIUS_M * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+
+def from_mercator(x, y):
+    lng = np.degrees(np.asarray(x) / EARTH_RADIUS_M)
+    lat = np.degrees(2 * np.arctan(np.exp(np.asarray(y) / EARTH_RADIUS_M)) - np.pi / 2)
+    return lat, lng
+
+
+def _sum_by_key(keys, weight):
+    """Group equal integer keys: (unique keys, inverse, weight sums, counts)."""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=weight, minlength=len(uniq))
+    counts = np.bincount(inverse, minlength=len(uniq))
+    return uniq, inverse, sums, counts
+
+
+def hex_bins(lat, lng, weight, radius_m, ref_lat=0.0):
+    """
+    Aggregate points into pointy-top hexagons of `radius_m` meters.
+
+    Hexagons live in Web Mercator, scaled at `ref_lat` (the view center),
+    which is how deck.gl's HexagonLayer sizes its own cells. Returns one row
+    per occupied hexagon: lat, lng (cell center), weight (sum) and count.
+    """
+    x, y = to_mercator(lat, lng)
+    weight = np.asarray(weight, dtype="float64")
+    r = radius_m / np.cos(np.radians(np.clip(ref_lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)))
+
+    # Fractional axial coordinates (q, s), then cube rounding to the nearest hex
+    q = (np.sqrt(3) / 3 * x - y / 3) / r
+    s = (2 / 3 * y) / r
+    t = -q - s
+    rq, rs, rt = np.round(q), np.round(s), np.round(t)
+    dq, ds, dt = np.abs(rq - q), np.abs(rs - s), np.abs(rt - t)
+    fix_q = (dq > ds) & (dq > dt)
+    fix_s = ~fix_q & (ds > dt)
+    rq = np.where(fix_q, -rs - rt, rq)
+    rs = np.where(fix_s, -rq - rt, rs)
+
+    keys = (rq.astype("int64") << 32) + (rs.astype("int64") & 0xFFFFFFFF)
+    uniq, _, sums, counts = _sum_by_key(keys, weight)
+    low = uniq & 0xFFFFFFFF
+    s_c = np.where(low >= 2 ** 31, low - 2 ** 32, low)
+    q_c = (uniq - low) >> 32
+
+    center_x = r * np.sqrt(3) * (q_c + s_c / 2)
+    center_y = r * 1.5 * s_c
+    c_lat, c_lng = from_mercator(center_x, center_y)
+    return pd.DataFrame({"lat": c_lat, "lng": c_lng, "weight": sums, "count": counts})
+
+
+def grid_bins(lat, lng, weight, cell_deg):
+    """
+    Aggregate points into square lat/lng cells of `cell_deg` degrees.
+
+    Each cell is placed at the weighted centroid of its points, so a heatmap
+    drawn from the cells keeps its hot spots where the cities are.
+    """
+    lat = np.asarray(lat, dtype="float64")
+    lng = np.asarray(lng, dtype="float64")
+    weight = np.asarray(weight, dtype="float64")
+    rows = np.floor((lat + 90.0) / cell_deg).astype("int64")
+    cols = np.floor((lng + 180.0) / cell_deg).astype("int64")
+    keys = rows * (int(360 / cell_deg) + 2) + cols
+
+    uniq, inverse, sums, counts = _sum_by_key(keys, weight)
+    # Weighted centroid; cells whose weights sum to 0 fall back to the plain mean
+    w = np.where(sums[inverse] > 0, weight, 1.0)
+    w_tot = np.bincount(inverse, weights=w, minlength=len(uniq))
+    c_lat = np.bincount(inverse, weights=lat * w, minlength=len(uniq)) / w_tot
+    c_lng = np.bincount(inverse, weights=lng * w, minlength=len(uniq)) / w_tot
+    return pd.DataFrame({"lat": c_lat, "lng": c_lng, "weight": sums, "count": counts})
+
+
+def heatmap_cell_deg(radius_px, zoom):
+    """Grid size (degrees) well below the heatmap kernel at this zoom."""
+    deg_per_px = 360.0 / (256 * 2 ** zoom)
+    return max(radius_px / 4 * deg_per_px, 0.01)
+
+
+def add_hex_style(cells, elevation_range=(0, 3000)):
+    """Color and height per cell, scaled like HexagonLayer's defaults."""
+    cells = cells.copy()
+    w = cells["weight"].to_numpy()
+    lo, hi = (w.min(), w.max()) if len(w) else (0.0, 0.0)
+    frac = (w - lo) / (hi - lo) if hi > lo else np.ones_like(w)
+    cells["elevation"] = elevation_range[0] + frac * (elevation_range[1] - elevation_range[0])
+    step = np.minimum((frac * len(HEX_COLORS)).astype(int), len(HEX_COLORS) - 1)
+    cells["color"] = HEX_COLORS[step].tolist()
+    return cells
+
+
+@st.cache_data(max_entries=32)
+def cached_hex_bins(lat, lng, weight, radius_m, ref_lat):
+    return add_hex_style(hex_bins(lat, lng, weight, radius_m, ref_lat))
+
+
+@st.cache_data(max_entries=32)
+def cached_grid_bins(lat, lng, weight, cell_deg):
+    return grid_bins(lat, lng, weight, cell_deg)
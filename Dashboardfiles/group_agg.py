@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+#############################
+# Vectorized per-group aggregations
+#############################
+
+# `groupby().agg({"col": lambda x: x.mode().iloc[0] ...})` runs Python code
+# for every group and column. Here values and groups are turned into integer
+# codes once and mode / nunique / top_k are counted over code pairs with
+# np.bincount (or a sort when the pair space is too large), so the cost no
+# longer grows with the number of groups.
+#
+#     aggregate(df, ["payment_method", "vehicle_type"], {
+#         "ride_distance": "mean",
+#         "pickup_location": "mode",
+#     })
+#
+# gives the same frame as the groupby().agg() with the mode lambdas. No
+# Streamlit imports, so notebooks and scripts can use it too.
+
+# Pair spaces up to this many cells are counted with one dense bincount
+DENSE_PAIRS_MAX = 1 << 24
+
+
+def group_ids(df, by, sort=True, dropna=True):
+    """
+    Group number per row (-1 for dropped NaN keys) and the group index, in
+    the order `df.groupby(by, sort=sort, dropna=dropna, observed=True)` uses.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    codes, levels = [], []
+    for key in by:
+        key_codes, uniques = _value_codes(df[key])
+        if not dropna and (key_codes < 0).any():
+            # NaN keys form their own group, last like in pandas
+            key_codes = np.where(key_codes < 0, len(uniques), key_codes)
+            uniques = uniques.append(pd.Index([np.nan]))
+        codes.append(key_codes)
+        levels.append(uniques)
+
+    sizes = [max(len(level), 1) for level in levels]
+    if np.prod(sizes, dtype="float64") >= 2 ** 62:
+        # Key space too large to pack into one int64, let pandas number them
+        grouped = df.groupby(by, sort=sort, dropna=dropna, observed=True)
+        return grouped.ngroup().to_numpy(), grouped.size().index
+
+    # Mixed-radix key: lexicographic in the (sorted) key codes
+    packed = np.zeros(len(df), dtype="int64")
+    missing = np.zeros(len(df), dtype=bool)
+    for key_codes, size in zip(codes, sizes):
+        missing |= key_codes < 0
+        packed = packed * size + np.maximum(key_codes, 0)
+
+    groups = np.full(len(df), -1, dtype="int64")
+    groups[~missing], present = pd.factorize(packed[~missing], sort=sort)
+
+    arrays = []
+    for level, size in zip(reversed(levels), reversed(sizes)):
+        present, level_codes = np.divmod(present, size)
+        arrays.append(level.take(level_codes))
+    arrays.reverse()
+    if len(by) == 1:
+        return groups, arrays[0].rename(by[0])
+    return groups, pd.MultiIndex.from_arrays(arrays, names=by)
+
+
+def _value_codes(values):
+    """Codes ordered by value (ties then resolve to the smallest, like
+    Series.mode()), -1 for NaN, and the distinct values."""
+    try:
+        codes, uniques = pd.factorize(values, sort=True)
+    except TypeError:
+        # Mixed types that can't be ordered: first appearance order
+        codes, uniques = pd.factorize(values)
+    return codes, pd.Index(uniques)
+
+
+def _pair_counts(groups, codes, n_groups, n_values):
+    """Distinct (group, value) pairs with their row counts, sorted by pair."""
+    valid = (groups >= 0) & (codes >= 0)
+    pairs = groups[valid].astype("int64") * n_values + codes[valid]
+    if n_groups * n_values <= DENSE_PAIRS_MAX:
+        counts = np.bincount(pairs, minlength=n_groups * n_values)
+        pairs = np.flatnonzero(counts)
+        counts = counts[pairs]
+    else:
+        pairs, counts = np.unique(pairs, return_counts=True)
+    return pairs // n_values, pairs % n_values, counts
+
+
+def _ranked(g, v, counts):
+    """Pair order: by group, most frequent first, smallest value on ties."""
+    return np.lexsort((v, -counts, g))
+
+
+def group_mode(values, groups, n_groups):
+    """Most frequent non-null value per group (None/NaN where all null)."""
+    codes, uniques = _value_codes(values)
+    g, v, counts = _pair_counts(groups, codes, n_groups, max(len(uniques), 1))
+    order = _ranked(g, v, counts)
+    g, v = g[order], v[order]
+    first = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else g
+
+    best = np.full(n_groups, -1, dtype="int64")
+    best[g[first]] = v[first]
+    return _take(uniques, best)
+
+
+def group_nunique(values, groups, n_groups):
+    """Distinct non-null values per group."""
+    codes, uniques = _value_codes(values)
+    g, _, _ = _pair_counts(groups, codes, n_groups, max(len(uniques), 1))
+    return np.bincount(g, minlength=n_groups)
+
+
+def group_top_k(values, groups, n_groups, k):
+    """
+    The `k` most frequent values per group, as (group, value, count, rank)
+    arrays, most frequent first (rank 1).
+    """
+    codes, uniques = _value_codes(values)
+    g, v, counts = _pair_counts(groups, codes, n_groups, max(len(uniques), 1))
+    order = _ranked(g, v, counts)
+    g, v, counts = g[order], v[order], counts[order]
+
+    starts = np.searchsorted(g, g, side="left")
+    rank = np.arange(len(g)) - starts + 1
+    keep = rank <= k
+    return g[keep], _take(uniques, v[keep]), counts[keep], rank[keep]
+
+
+def _take(uniques, codes):
+    if not len(uniques):
+        return np.full(len(codes), None, dtype=object)
+    out = uniques.take(np.maximum(codes, 0)).to_numpy(dtype=object)
+    out[codes < 0] = None
+    return out
+
+
+#############################
+# groupby().agg()-style front end
+#############################
+
+VECTORIZED = {
+    "mode": group_mode,
+    "nunique": group_nunique,
+}
+
+
+def aggregate(df, by, spec, sort=True, dropna=True):
+    """
+    `df.groupby(by).agg(spec)` where `spec` maps columns to a function name
+    or a list of them. "mode" and "nunique" run through the vectorized
+    counters above; every other name goes to pandas as usual.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    groups, index = group_ids(df, by, sort=sort, dropna=dropna)
+    n_groups = len(index)
+
+    multi = any(isinstance(funcs, (list, tuple)) for funcs in spec.values())
+    keep = groups >= 0
+    columns = []
+    keys = []
+    for column, funcs in spec.items():
+        for func in funcs if isinstance(funcs, (list, tuple)) else [funcs]:
+            if isinstance(func, str) and func in VECTORIZED:
+                values = VECTORIZED[func](df[column], groups, n_groups)
+            else:
+                # Built-in reductions are already vectorized in pandas; group
+                # by the ids computed above instead of re-factorizing the keys
+                values = (
+                    df[column][keep].groupby(groups[keep]).agg(func)
+                    .reindex(range(n_groups)).to_numpy()
+                )
+            columns.append(values)
+            keys.append((column, func if isinstance(func, str) else getattr(func, "__name__", "<lambda>")))
+
+    out = pd.DataFrame(dict(enumerate(columns)), index=index)
+    out.columns = pd.MultiIndex.from_tuples(keys) if multi else [column for column, _ in keys]
+    # object arrays of numbers (from mode) back to a numeric dtype
+    return out.infer_objects()
+
+
+def top_k(df, by, column, k=3, sort=True, dropna=True):
+    """Long frame of the `k` most frequent `column` values in each group."""
+    by = [by] if isinstance(by, str) else list(by)
+    groups, index = group_ids(df, by, sort=sort, dropna=dropna)
+    g, values, counts, rank = group_top_k(df[column], groups, len(index), k)
+    out = index[g].to_frame(index=False)
+    out[column] = values
+    out["count"] = counts
+    out["rank"] = rank
+    return out
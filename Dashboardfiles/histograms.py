@@ -0,0 +1,179 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+#############################
+# Server-side histograms
+#############################
+
+# Histograms used to ship every row to the browser and let Vega-Lite /
+# plotly.js bin them. Here the bins (and box-plot quartiles) are counted
+# with NumPy and the charts only receive one row per bar.
+
+
+def nice_edges(lo, hi, maxbins):
+    """
+    Bin edges covering [lo, hi] with at most `maxbins` bins.
+
+    Same step rule as Vega-Lite's `bin: {maxbins}` (1, 2 or 5 x 10^k, edges
+    on multiples of the step), so server-binned charts look like the old ones.
+    """
+    if not np.isfinite(lo) or not np.isfinite(hi):
+        return np.array([0.0, 1.0])
+    span = hi - lo
+    if span <= 0:
+        span = abs(lo) if lo else 1.0
+        hi = lo + span
+
+    level = math.ceil(math.log10(maxbins))
+    step = 10 ** (round(math.log10(span)) - level)
+    while math.ceil(span / step) > maxbins:
+        step *= 10
+    for div in (5, 2):
+        if span / (step / div) <= maxbins:
+            step /= div
+
+    precision = 0 if step >= 1 else int(-math.log10(step)) + 1
+    eps = 10 ** (-precision - 1)
+    start = math.floor(lo / step + eps) * step
+    if lo < start:
+        start -= step
+    stop = math.ceil(hi / step) * step
+    count = max(1, int(round((stop - start) / step)))
+    return np.round(start + step * np.arange(count + 1), precision)
+
+
+def _finite(values):
+    values = np.asarray(values, dtype="float64")
+    return values[np.isfinite(values)]
+
+
+def histogram(values, maxbins=30, extent=None, density=False):
+    """Bars for `values`: bin_start, bin_end, count (and density if asked)."""
+    values = _finite(values)
+    if extent is None:
+        extent = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+    edges = nice_edges(extent[0], extent[1], maxbins)
+
+    # Bins are [start, end) except the last, which also takes its right edge
+    idx = np.searchsorted(edges, values, side="right") - 1
+    idx = np.clip(idx, 0, len(edges) - 2)
+    counts = np.bincount(idx, minlength=len(edges) - 1)
+
+    bars = pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+    if density:
+        total = counts.sum()
+        bars["density"] = counts / (total * np.diff(edges)) if total else 0.0
+    return bars
+
+
+def box_stats(values):
+    """Quartiles and Tukey whiskers (1.5 IQR, clipped to the data)."""
+    values = _finite(values)
+    if not len(values):
+        return {"count": 0}
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        "count": len(values),
+        "min": float(values.min()),
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "max": float(values.max()),
+        "lowerfence": float(inside.min()),
+        "upperfence": float(inside.max()),
+    }
+
+
+@st.cache_data(max_entries=64)
+def cached_histograms(version, columns, maxbins, filter_key, _df, density=False, box=False):
+    """
+    Histograms of `columns` in `_df` on shared edges, plus box stats if asked.
+
+    The frame itself isn't hashed: `version` (the source file key) and
+    `filter_key` (anything describing the active filters) identify it.
+    Returns (bars with a `column` field, {column: box stats}).
+    """
+    arrays = {c: _finite(_df[c].to_numpy()) for c in columns}
+    present = [a for a in arrays.values() if len(a)]
+    extent = (
+        (min(a.min() for a in present), max(a.max() for a in present))
+        if present else None
+    )
+    bars = pd.concat(
+        [histogram(a, maxbins, extent, density).assign(column=c) for c, a in arrays.items()],
+        ignore_index=True,
+    )
+    boxes = {c: box_stats(a) for c, a in arrays.items()} if box else {}
+    return bars, boxes
+
+
+#############################
+# Charts over pre-binned bars
+#############################
+
+# altair / plotly are imported by the builder that uses them, so a page only
+# loads the chart library it actually draws with
+
+def altair_bars(bars, title=None, y="count"):
+    """Bar chart of pre-binned data (Vega-Lite's `bin="binned"`)."""
+    import altair as alt
+
+    return alt.Chart(bars).mark_bar().encode(
+        x=alt.X("bin_start:Q", bin="binned", title=title),
+        x2="bin_end:Q",
+        y=alt.Y(f"{y}:Q", title=y.replace("_", " ").title()),
+    )
+
+
+def plotly_histogram(bars, boxes=None, y="density", opacity=0.6):
+    """
+    Overlaid per-column bars with an optional box-plot strip above, in the
+    layout of `px.histogram(..., color=..., barmode="overlay", marginal="box")`.
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    boxes = boxes or {}
+    fig = make_subplots(
+        rows=2 if boxes else 1, cols=1, shared_xaxes=True,
+        row_heights=[0.2, 0.8] if boxes else None, vertical_spacing=0.03,
+    )
+    colors = px.colors.qualitative.Plotly
+    bar_row = 2 if boxes else 1
+
+    for i, (column, part) in enumerate(bars.groupby("column", sort=False)):
+        color = colors[i % len(colors)]
+        fig.add_trace(
+            go.Bar(
+                x=(part["bin_start"] + part["bin_end"]) / 2,
+                y=part[y],
+                width=part["bin_end"] - part["bin_start"],
+                name=column, legendgroup=column,
+                marker_color=color, opacity=opacity,
+            ),
+            row=bar_row, col=1,
+        )
+        stats = boxes.get(column)
+        if stats and stats["count"]:
+            fig.add_trace(
+                go.Box(
+                    y=[column], orientation="h",
+                    q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+                    lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]],
+                    name=column, legendgroup=column, showlegend=False,
+                    marker_color=color,
+                ),
+                row=1, col=1,
+            )
+
+    fig.update_layout(barmode="overlay", bargap=0, legend_title_text="Metric")
+    fig.update_yaxes(title_text=y.replace("_", " "), row=bar_row, col=1)
+    if boxes:
+        fig.update_yaxes(showticklabels=False, row=1, col=1)
+    return fig
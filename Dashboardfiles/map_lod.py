@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+#############################
+# Level-of-detail point clustering for st.map
+#############################
+
+# Points are snapped to a Web Mercator grid at every zoom level (4 x 4 cells
+# per map tile, so a cell is ~64 px on screen at that zoom). The cell a point
+# falls in is precomputed once per dataset for every level; a filtered view
+# then only needs a bincount to get its clusters, and the map receives at
+# most `max_points` rows whatever the dataset size.
+#
+# The level also follows the map's extent: clusters are at most
+# VIEW_DETAIL_LEVELS zoom levels finer than the zoom the view is drawn at
+# (cells of ~16 px on screen), since finer cells only add points the eye
+# can't separate. st.map does not report its viewport back to the script
+# (panning and zooming happen in the browser only); it fits its view to the
+# points it gets, so by default the extent is that of the selected rows.
+# Callers that know the view can pass it as `viewport`.
+
+MAX_ZOOM = 18
+CELLS_PER_TILE_LOG2 = 2
+EQUATOR_M = 40_075_016.686
+DEFAULT_MAX_POINTS = 5_000
+VIEW_DETAIL_LEVELS = 2
+
+
+def tile_coords(lat, lng):
+    """Normalized Web Mercator coordinates in [0, 1)."""
+    lat = np.clip(np.asarray(lat, dtype="float64"), -85.051129, 85.051129)
+    x = (np.asarray(lng, dtype="float64") + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / np.pi) / 2.0
+    return np.clip(x, 0.0, 1.0 - 1e-12), np.clip(y, 0.0, 1.0 - 1e-12)
+
+
+def cell_meters(zoom):
+    """Width of one cluster cell at `zoom`, measured at the equator."""
+    return EQUATOR_M / 2 ** (zoom + CELLS_PER_TILE_LOG2)
+
+
+class ClusterIndex:
+    """
+    Hierarchical grid clusters for one set of points.
+
+    `levels[z]` maps every point to its cluster id at zoom z; cluster ids
+    are dense (0..n_clusters-1) so counts and centroids for any subset of
+    the points are a few bincounts.
+    """
+
+    def __init__(self, lat, lng, max_zoom=MAX_ZOOM):
+        self.lat = np.asarray(lat, dtype="float64")
+        self.lng = np.asarray(lng, dtype="float64")
+        self.max_zoom = max_zoom
+
+        bits = max_zoom + CELLS_PER_TILE_LOG2
+        x, y = tile_coords(self.lat, self.lng)
+        ix = (x * 2 ** bits).astype("int64")
+        iy = (y * 2 ** bits).astype("int64")
+
+        self.levels = []
+        self.n_clusters = []
+        for z in range(max_zoom + 1):
+            shift = max_zoom - z
+            keys = ((ix >> shift) << bits) + (iy >> shift)
+            uniq, inverse = np.unique(keys, return_inverse=True)
+            self.levels.append(inverse.astype("int32"))
+            self.n_clusters.append(len(uniq))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _counts(self, zoom, rows):
+        return np.bincount(self.levels[zoom][rows], minlength=self.n_clusters[zoom])
+
+    def pick_zoom(self, rows, max_points):
+        """Finest zoom whose clusters for `rows` fit in `max_points`."""
+        lo, hi = 0, self.max_zoom
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if np.count_nonzero(self._counts(mid, rows)) <= max_points:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def clusters(self, selection=None, max_points=DEFAULT_MAX_POINTS, viewport=None):
+        """
+        Representative points for the selected rows.
+
+        `selection` is a boolean mask or an array of row positions (None
+        means every point). `viewport` is the (south, west, north, east)
+        box the map shows: rows outside it are left out and the level is
+        capped at the zoom it is drawn at; without it the selected rows'
+        extent is used (see above). Returns a frame with lat, lng, count and
+        size (meters, for st.map's `size`). If everything fits in
+        `max_points` the points themselves are returned with count 1.
+        """
+        if selection is None:
+            rows = np.arange(len(self))
+        else:
+            selection = np.asarray(selection)
+            rows = np.flatnonzero(selection) if selection.dtype == bool else selection
+        if viewport is None:
+            view_zoom = self._fit_zoom(rows)
+        else:
+            south, west, north, east = viewport
+            lat, lng = self.lat[rows], self.lng[rows]
+            rows = rows[(lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)]
+            view_zoom = self._view_zoom(north - south, east - west)
+        if len(rows) <= max_points:
+            zoom = view_zoom
+            return pd.DataFrame({
+                "lat": self.lat[rows],
+                "lng": self.lng[rows],
+                "count": np.ones(len(rows), dtype="int64"),
+                "size": np.full(len(rows), cell_meters(zoom) * 0.15),
+            })
+
+        zoom = min(self.pick_zoom(rows, max_points), view_zoom + VIEW_DETAIL_LEVELS)
+        ids = self.levels[zoom][rows]
+        n = self.n_clusters[zoom]
+        counts = np.bincount(ids, minlength=n)
+        used = counts > 0
+        lat = np.bincount(ids, weights=self.lat[rows], minlength=n)[used] / counts[used]
+        lng = np.bincount(ids, weights=self.lng[rows], minlength=n)[used] / counts[used]
+        counts = counts[used]
+
+        cell = cell_meters(zoom)
+        size = cell * (0.15 + 0.35 * np.sqrt(counts / counts.max()))
+        return pd.DataFrame({"lat": lat, "lng": lng, "count": counts, "size": size})
+
+    def _view_zoom(self, lat_span, lng_span):
+        # Rough zoom at which a box this size fills a ~1000 px wide map
+        span = max(lng_span, lat_span * 2, 1e-6)
+        return int(np.clip(np.log2(360.0 / span * 1000 / 256), 0, self.max_zoom))
+
+    def _fit_zoom(self, rows):
+        # The zoom st.map picks when it fits its view to these points
+        if len(rows) < 2:
+            return 10
+        return self._view_zoom(np.ptp(self.lat[rows]), np.ptp(self.lng[rows]))
+
+
+@st.cache_resource(max_entries=4)
+def get_cluster_index(version, _lat, _lng):
+    """One cluster hierarchy per dataset version, shared by every session."""
+    return ClusterIndex(_lat, _lng)
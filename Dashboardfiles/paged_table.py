@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+#############################
+# Server-side paginated tables
+#############################
+
+# st.dataframe serializes the whole frame (Arrow IPC) to the browser, which
+# doesn't scale to large results. `paged_table` keeps the frame on the
+# server and only sends the visible page; sorting and searching run here
+# over cached row orders, and the current page lives in session state.
+
+PAGE_SIZE = 50
+
+
+def sort_order(df, column, ascending=True):
+    """Row positions of `df` ordered by `column` (stable, nulls last)."""
+    values = df[column].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+
+
+def search_mask(df, query, columns=None):
+    """Rows where any text column contains `query` (case-insensitive)."""
+    query = query.lower()
+    mask = np.zeros(len(df), dtype=bool)
+    for column in columns or df.columns:
+        col = df[column]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            # Match each category once, then look rows up by code
+            hits = col.cat.categories.astype(str).str.lower().str.contains(query, regex=False)
+            codes = col.cat.codes.to_numpy()
+            mask |= (codes >= 0) & np.asarray(hits)[codes]
+        elif col.dtype == object or pd.api.types.is_string_dtype(col.dtype):
+            mask |= col.astype(str).str.lower().str.contains(query, regex=False).to_numpy()
+    return mask
+
+
+@st.cache_data(max_entries=64)
+def _cached_sort_order(version, filter_key, column, ascending, _df):
+    return sort_order(_df, column, ascending)
+
+
+@st.cache_data(max_entries=64)
+def _cached_search(version, filter_key, query, columns, _df):
+    return search_mask(_df, query, columns)
+
+
+def page_rows(df, sort_by=None, ascending=True, query="", search_columns=None,
+              version=None, filter_key=None):
+    """
+    Row positions of `df` after searching and sorting. With a `version` (and
+    `filter_key` for filtered frames) the sort orders and search results are
+    cached, so paging through them is a slice.
+    """
+    cached = version is not None
+    if sort_by:
+        order = (_cached_sort_order(version, filter_key, sort_by, ascending, df)
+                 if cached else sort_order(df, sort_by, ascending))
+    else:
+        order = np.arange(len(df))
+    if query:
+        columns = tuple(search_columns) if search_columns else None
+        mask = (_cached_search(version, filter_key, query, columns, df)
+                if cached else search_mask(df, query, columns))
+        order = order[mask[order]]
+    return order
+
+
+def _reset_page(key):
+    st.session_state[f"{key}_page"] = 1
+
+
+def paged_table(df, key, page_size=PAGE_SIZE, search_columns=None, version=None,
+                filter_key=None, **dataframe_kwargs):
+    """
+    Search box, sort controls and one page of `df` in an `st.dataframe`.
+
+    Frames that fit on one page are shown as a plain `st.dataframe`. `key`
+    names the widgets and the page cursor in session state; pass `version`
+    / `filter_key` when `df` is a cached dataset so sorting and searching
+    are cached too. Returns the page that was shown.
+    """
+    if len(df) <= page_size:
+        st.dataframe(df, **dataframe_kwargs)
+        return df
+
+    c1, c2, c3 = st.columns([3, 2, 1])
+    query = c1.text_input("Search", key=f"{key}_query", on_change=_reset_page, args=(key,),
+                          placeholder="Filter rows containing...")
+    sort_by = c2.selectbox("Sort by", [None, *df.columns], key=f"{key}_sort",
+                           format_func=lambda c: "(file order)" if c is None else str(c),
+                           on_change=_reset_page, args=(key,))
+    descending = c3.toggle("Descending", key=f"{key}_desc", on_change=_reset_page, args=(key,))
+
+    rows = page_rows(df, sort_by, not descending, query.strip(), search_columns, version, filter_key)
+    pages = max(1, -(-len(rows) // page_size))
+    page_key = f"{key}_page"
+    # The cursor: clamped when a search or filter shrinks the result
+    st.session_state[page_key] = min(st.session_state.get(page_key, 1), pages)
+
+    page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    start = (page - 1) * page_size
+    shown = df.iloc[rows[start:start + page_size]]
+    st.dataframe(shown, **dataframe_kwargs)
+    st.caption(f"Rows {start + 1 if len(rows) else 0}-{start + len(shown)} of {len(rows):,}"
+               + (f" matching \"{query.strip()}\"" if query.strip() else "")
+               + f" ({len(df):,} total)")
+    return shown
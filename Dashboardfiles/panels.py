@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import streamlit as st
+
+#############################
+# Parallel panel preparation
+#############################
+
+# Most panels on a page do independent work: a groupby here, a resample
+# there, a plotly figure or pydeck spec to build. `Panels` runs each
+# panel's preparation on a shared thread pool as soon as the panels it
+# depends on are done, while the script keeps rendering top to bottom and
+# only waits when it reaches a panel that isn't ready yet:
+#
+#     panels = Panels()
+#     panels.add("state_max", max_price_by_state, version, df)
+#     panels.add("top_states", lambda m: m.head(10), deps=["state_max"])
+#     ...
+#     st.bar_chart(panels.result("state_max"))
+#
+# Only preparation moves to the pool; widgets and st.* calls stay on the
+# script thread, so elements still appear in page order. pandas / NumPy
+# kernels and Arrow release the GIL for much of their work, so on several
+# cores a page takes closer to its slowest panel than the sum of them.
+# (Python-level work like building figures still takes turns on the GIL.)
+#
+# Workers run without a session context on purpose, so nothing they call
+# (e.g. a cache spinner) can write into the page out of order; Streamlit
+# logs a "missing ScriptRunContext" warning for them, as it does for the
+# refresher thread.
+
+# Worker threads shared by every session; 0 prepares each panel inline when
+# it is added (the old one-after-another order), the default on one core
+_CPUS = os.cpu_count() or 1
+PANEL_THREADS = int(os.environ.get("DASHBOARD_PANEL_THREADS", min(8, _CPUS) if _CPUS > 1 else 0))
+
+
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=PANEL_THREADS, thread_name_prefix="panel")
+
+
+def _same(a, b):
+    # Frames / arrays by identity, plain values by equality
+    if a is b:
+        return True
+    return (
+        type(a) is type(b)
+        and isinstance(a, (bool, int, float, str, tuple, type(None)))
+        and a == b
+    )
+
+
+class Panels:
+    """The panels of one script run; see above."""
+
+    def __init__(self, threads=PANEL_THREADS):
+        self._executor = get_executor() if threads > 0 else None
+        self._futures = {}
+        self._args = {}
+        self._seconds = {}
+
+    def add(self, name, func, *args, deps=(), **kwargs):
+        """
+        Prepare panel `name` as `func(*dependency results, *args, **kwargs)`,
+        starting once every panel named in `deps` has finished.
+        """
+        if name in self._futures:
+            raise ValueError(f"panel {name!r} was already added")
+        missing = [dep for dep in deps if dep not in self._futures]
+        if missing:
+            raise KeyError(f"panel {name!r} depends on panels not added yet: {missing}")
+
+        inputs = [self._futures[dep] for dep in deps]
+        out = Future()
+        self._futures[name] = out
+        self._args[name] = (args, kwargs)
+        task = (name, out, func, inputs, args, kwargs)
+
+        if self._executor is None:
+            self._run(*task)
+        elif not inputs:
+            self._executor.submit(self._run, *task)
+        else:
+            # Submitted by whichever dependency finishes last, so no worker
+            # sits blocked waiting for another panel
+            remaining = [len(inputs)]
+            lock = threading.Lock()
+
+            def ready(_):
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._executor.submit(self._run, *task)
+
+            for future in inputs:
+                future.add_done_callback(ready)
+
+    def _run(self, name, out, func, inputs, args, kwargs):
+        if not out.set_running_or_notify_cancel():
+            return
+        try:
+            values = [future.result() for future in inputs]   # re-raises a failed dependency
+            start = time.perf_counter()
+            result = func(*values, *args, **kwargs)
+            self._seconds[name] = time.perf_counter() - start
+        except BaseException as exc:
+            out.set_exception(exc)
+        else:
+            out.set_result(result)
+
+    def result(self, name):
+        """Panel `name`'s result, waiting for it if needed; re-raises its error."""
+        return self._futures[name].result()
+
+    def get(self, name, func, *args, **kwargs):
+        """
+        `func(*args, **kwargs)`, taken from panel `name` when it was added
+        with the same arguments, else computed here. For fragments: the full
+        run prepares their panels ahead, a fragment rerun with new widget
+        values computes its own.
+        """
+        if name in self._futures:
+            added_args, added_kwargs = self._args[name]
+            if (len(added_args) == len(args) and added_kwargs.keys() == kwargs.keys()
+                    and all(_same(a, b) for a, b in zip(added_args, args))
+                    and all(_same(added_kwargs[k], kwargs[k]) for k in kwargs)):
+                return self.result(name)
+        return func(*args, **kwargs)
+
+    def prepare_ms(self, name):
+        """Time panel `name` spent preparing (off the script thread when pooled)."""
+        seconds = self._seconds.get(name)
+        return None if seconds is None else round(seconds * 1000, 2)
@@ -0,0 +1,165 @@
+import functools
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import streamlit as st
+
+#############################
+# Opt-in section profiling
+#############################
+
+# Turn on with DASHBOARD_PROFILE=1 in the environment or ?profile=1 in the
+# URL. Each wrapped section records wall time, CPU time, rows in/out and the
+# serialized size of what it sends to the browser. Spans show up in a
+# sidebar debug panel and are logged as one JSON line each (OpenTelemetry
+# span field names) on the "dashboard.profile" logger.
+
+logger = logging.getLogger("dashboard.profile")
+
+_SPANS_KEY = "_profile_spans"
+_TRACE_KEY = "_profile_trace_id"
+
+
+def enabled():
+    if os.environ.get("DASHBOARD_PROFILE") == "1":
+        return True
+    try:
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        # No script run context (bare python / tests)
+        return False
+
+
+def payload_bytes(obj):
+    """Approximate bytes sent to the browser for a chart or frame."""
+    if obj is None:
+        return 0
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):
+        try:
+            import pyarrow as pa
+
+            # st.dataframe / st.*_chart ship frames as Arrow IPC
+            sink = pa.BufferOutputStream()
+            table = pa.Table.from_pandas(obj)
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().size
+        except Exception:
+            return int(obj.memory_usage(deep=True).sum())
+    if hasattr(obj, "to_json"):
+        # plotly figures, altair charts, pydeck decks
+        return len(obj.to_json())
+    return len(json.dumps(obj, default=str))
+
+
+class Span:
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.attributes = {"rows_in": rows_in, "rows_out": None, "payload_bytes": 0}
+        self.payloads = []
+
+    def set(self, rows_out=None, payload=None, **attributes):
+        """Record output rows and/or an element about to be sent."""
+        if rows_out is not None:
+            self.attributes["rows_out"] = int(rows_out)
+        if payload is not None:
+            # sized after the clocks stop, so serializing isn't timed
+            self.payloads.append(payload)
+        self.attributes.update(attributes)
+
+
+class _NoSpan:
+    def set(self, *args, **kwargs):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _trace_id():
+    return st.session_state.setdefault(_TRACE_KEY, uuid.uuid4().hex)
+
+
+@contextmanager
+def section(name, rows_in=None):
+    """
+    Time a block of a dashboard script.
+
+        with profiling.section("top10", rows_in=len(df_f)) as span:
+            top10 = ...
+            span.set(rows_out=len(top10), payload=chart)
+    """
+    if not enabled():
+        yield _NO_SPAN
+        return
+
+    span = Span(name, rows_in)
+    start_ns = time.time_ns()
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield span
+    finally:
+        wall_ms = round((time.perf_counter() - wall) * 1000, 2)
+        cpu_ms = round((time.thread_time() - cpu) * 1000, 2)
+        end_ns = time.time_ns()
+        span.attributes["payload_bytes"] = sum(payload_bytes(p) for p in span.payloads)
+        record = {
+            "name": name,
+            "trace_id": _trace_id(),
+            "span_id": uuid.uuid4().hex[:16],
+            "start_time_unix_nano": start_ns,
+            "end_time_unix_nano": end_ns,
+            "attributes": {
+                "wall_ms": wall_ms,
+                "cpu_ms": cpu_ms,
+                **span.attributes,
+            },
+        }
+        st.session_state.setdefault(_SPANS_KEY, []).append(record)
+        logger.info(json.dumps(record))
+
+
+def profiled(name=None):
+    """Decorator form of `section` for whole functions."""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with section(name or func.__name__):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def start_run():
+    """Call at the top of a script: begins a new trace for this rerun."""
+    if enabled():
+        st.session_state[_SPANS_KEY] = []
+        st.session_state[_TRACE_KEY] = uuid.uuid4().hex
+
+
+def debug_panel():
+    """Call at the end of a script: sidebar table of this run's spans."""
+    if not enabled():
+        return
+    spans = st.session_state.get(_SPANS_KEY, [])
+    with st.sidebar.expander("Profiling", expanded=True):
+        if not spans:
+            st.caption("No sections recorded.")
+            return
+        rows = [{"section": s["name"], **s["attributes"]} for s in spans]
+        total = sum(r["wall_ms"] for r in rows)
+        st.caption(f"{len(rows)} sections, {total:.0f} ms total")
+        st.dataframe(rows, hide_index=True)
+
+        from result_cache import stats
+
+        cache = stats()
+        st.caption(
+            f"Result cache: {cache['hits']} hits, {cache['misses']} misses, "
+            f"{cache['evictions']} evictions, {cache['bytes'] / 2 ** 20:.1f} MB on disk"
+        )
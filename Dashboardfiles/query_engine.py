@@ -0,0 +1,196 @@
+import hashlib
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import streamlit as st
+
+from data_loader import CACHE_DIR
+
+#############################
+# Optional DuckDB backend
+#############################
+
+# With DASHBOARD_BACKEND=duckdb the filters and aggregations below run as SQL
+# in an embedded DuckDB over Parquet snapshots of the datasets, instead of as
+# pandas operations over the loaded frames. DuckDB only reads the columns a
+# query names and skips row groups its WHERE clause rules out, and it runs
+# each query on several threads. Every function returns the same frame the
+# pandas path builds, so the charts don't change.
+#
+# duckdb is optional; without it (or with the default "pandas" backend)
+# `enabled()` is False and the dashboards use their pandas code.
+
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas").lower()
+POOL_SIZE = int(os.environ.get("DASHBOARD_DUCKDB_POOL", 4))
+# Threads per query; 0 lets DuckDB use every core
+DUCKDB_THREADS = int(os.environ.get("DASHBOARD_DUCKDB_THREADS", 0))
+
+# Small row groups let min/max statistics skip most of a file on selective filters
+ROW_GROUP_SIZE = 64_000
+
+
+def enabled():
+    if BACKEND != "duckdb":
+        return False
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """
+    A fixed set of cursors on one in-process DuckDB database.
+
+    A DuckDB connection must not be used by two threads at once, so every
+    query borrows a cursor for its duration; sessions running at the same
+    time get different cursors (and wait when all are busy).
+    """
+
+    def __init__(self, size=POOL_SIZE, threads=DUCKDB_THREADS):
+        import duckdb
+
+        self._db = duckdb.connect(":memory:")
+        if threads:
+            self._db.execute(f"SET threads TO {int(threads)}")
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._db.cursor())
+
+    @contextmanager
+    def connection(self):
+        con = self._idle.get()
+        try:
+            yield con
+        finally:
+            self._idle.put(con)
+
+    def query(self, sql, params=()):
+        with self.connection() as con:
+            return con.execute(sql, list(params)).df()
+
+
+@st.cache_resource
+def get_pool():
+    return ConnectionPool()
+
+
+#############################
+# Parquet snapshots
+#############################
+
+_write_lock = threading.Lock()
+
+
+def parquet_source(version, df, name):
+    """
+    Parquet file holding `df` (the shared frame for this dataset `version`)
+    plus a `_row` column with each row's position, written once per version.
+    Positions let SQL results index straight back into the shared frame.
+    """
+    path, mtime_ns, size = version
+    digest = hashlib.sha1(f"{path}|{mtime_ns}|{size}|{name}".encode()).hexdigest()[:12]
+    target = os.path.join(CACHE_DIR, f"{name}-{digest}.parquet")
+    if os.path.exists(target):
+        return target
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with _write_lock:
+        if not os.path.exists(target):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.append_column("_row", pa.array(np.arange(len(df), dtype="int64")))
+            tmp = f"{target}.tmp"
+            pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+            os.replace(tmp, target)
+    return target
+
+
+#############################
+# World dashboard queries
+#############################
+
+_WORLD_FILTER = "list_contains(?, country) AND population BETWEEN ? AND ?"
+
+
+def world_rows(source, countries, lo, hi):
+    """Sorted row positions matching the sidebar filters (FilterIndex.select)."""
+    rows = get_pool().query(
+        f"SELECT _row FROM read_parquet(?) WHERE {_WORLD_FILTER} ORDER BY _row",
+        [source, list(countries), lo, hi],
+    )
+    return rows["_row"].to_numpy()
+
+
+def world_top_countries(source, countries, lo, hi, k=10):
+    """Countries with the largest summed city population under the filters."""
+    return get_pool().query(
+        f"""
+        SELECT CAST(country AS VARCHAR) AS country, SUM(population) AS population
+        FROM read_parquet(?) WHERE {_WORLD_FILTER}
+        GROUP BY country ORDER BY population DESC, country LIMIT {int(k)}
+        """,
+        [source, list(countries), lo, hi],
+    )
+
+
+def world_centroids(source, countries, lo, hi, k=10):
+    """Mean population / lat / lng per country, top `k` by mean population."""
+    return get_pool().query(
+        f"""
+        SELECT CAST(country AS VARCHAR) AS country, AVG(population) AS population,
+               AVG(lat) AS lat, AVG(lng) AS lng
+        FROM read_parquet(?) WHERE {_WORLD_FILTER}
+        GROUP BY country ORDER BY population DESC, country LIMIT {int(k)}
+        """,
+        [source, list(countries), lo, hi],
+    )
+
+
+#############################
+# Uber rollup cube
+#############################
+
+def uber_rollup(source):
+    """
+    The rollup cube of `rollup.build_uber_rollup` as one GROUP BY, with the
+    groups in order of first appearance like the pandas version.
+    """
+    pool = get_pool()
+    cube = pool.query(
+        """
+        SELECT
+            date_trunc('day', date) AS date,
+            CAST(vehicle_type AS VARCHAR) AS vehicle_type,
+            CAST(payment_method AS VARCHAR) AS payment_method,
+            CAST(reason_for_cancelling_by_customer AS VARCHAR) AS reason_for_cancelling_by_customer,
+            CAST(driver_cancellation_reason AS VARCHAR) AS driver_cancellation_reason,
+            COUNT(*) AS rows,
+            COUNT(booking_id) AS booking_id_count,
+            COALESCE(SUM(booking_value), 0) AS booking_value_sum,
+            COUNT(booking_value) AS booking_value_count,
+            COALESCE(SUM(customer_rating), 0) AS customer_rating_sum,
+            COUNT(customer_rating) AS customer_rating_count,
+            COALESCE(SUM(cancelled_rides_by_customer), 0) AS cancelled_rides_by_customer_sum
+        FROM read_parquet(?)
+        GROUP BY ALL
+        ORDER BY MIN(_row)
+        """,
+        [source],
+    )
+    cube["date"] = cube["date"].astype("datetime64[ns]")
+    # Same key dtypes as the pandas cube (sorted categories), so the panel
+    # queries group and order identically
+    for key in ("vehicle_type", "payment_method",
+                "reason_for_cancelling_by_customer", "driver_cancellation_reason"):
+        cube[key] = cube[key].astype("category")
+
+    unique = pool.query("SELECT COUNT(DISTINCT booking_id) AS n FROM read_parquet(?)", [source])
+    cube.attrs["unique_bookings"] = int(unique["n"].iloc[0])
+    return cube
@@ -0,0 +1,208 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+#############################
+# Per-group ranking index
+#############################
+
+
+class _Group:
+    # One group's rows, largest value first (ties in row order)
+    __slots__ = ("rows", "neg", "prefix")
+
+    def __init__(self, rows, neg, prefix):
+        self.rows = rows        # row positions
+        self.neg = neg          # -value in that order (ascending, for searchsorted)
+        self.prefix = prefix    # {column: running sums with a leading 0}
+
+
+class RankingIndex:
+    """
+    Rows kept sorted by a value within each group, with running sums.
+
+    Built once per dataset version:
+      - per group, the row positions ordered by value, largest first (ties
+        in row order, like `nlargest`), so a value range is two
+        searchsorted calls
+      - per group, running sums of the value and of any extra `sums`
+        columns in that same order, so the count / sum / mean of a group
+        over a value range are two lookups
+
+    `top` answers "the k largest rows of group g with lo <= value <= hi" by
+    reading the front of that range, and `top_groups` ranks whole groups by
+    their sum or mean over it. Rows with a missing value or group are left
+    out. `appended` extends a copy with new rows, rebuilding only the groups
+    that got some. Pass `groups=None` to rank all rows as a single group.
+    """
+
+    def __init__(self, groups, values, sums=None):
+        self.values = np.asarray(values, dtype="float64")
+        self.sums = {name: np.asarray(col, dtype="float64") for name, col in (sums or {}).items()}
+        if groups is None:
+            self.codes = np.zeros(len(self.values), dtype="int64")
+            self.names = [None]
+        else:
+            codes, uniques = pd.factorize(pd.Series(groups), sort=True)
+            self.codes = codes.astype("int64")
+            self.names = list(uniques)
+        self.code_of = {name: i for i, name in enumerate(self.names)}
+
+        rows = self._rankable(0)
+        order = rows[np.lexsort((-self.values[rows], self.codes[rows]))]   # stable: ties stay in row order
+        offsets = np.searchsorted(self.codes[order], np.arange(len(self.names) + 1))
+        self._groups = [self._group(order[a:b]) for a, b in zip(offsets[:-1], offsets[1:])]
+
+    def __len__(self):
+        return len(self.values)
+
+    def _rankable(self, start):
+        # Positions from `start` on with both a group and a value
+        codes, values = self.codes[start:], self.values[start:]
+        return start + np.flatnonzero((codes >= 0) & ~np.isnan(values))
+
+    def _group(self, rows):
+        columns = {"value": self.values, **self.sums}
+        prefix = {name: np.concatenate(([0.0], np.nancumsum(col[rows]))) for name, col in columns.items()}
+        return _Group(rows, -self.values[rows], prefix)
+
+    def _span(self, group, lo, hi):
+        # Slice of the group's order with lo <= value <= hi
+        return (np.searchsorted(group.neg, -hi, side="left"),
+                np.searchsorted(group.neg, -lo, side="right"))
+
+    def top(self, k, group=None, lo=-np.inf, hi=np.inf, keep=None):
+        """
+        Row positions of the `k` largest values in `group` within [lo, hi],
+        largest first. With a boolean row mask `keep`, the range is walked
+        in growing chunks and stops once `k` kept rows are found.
+        """
+        code = self.code_of.get(group)
+        if code is None:
+            return np.empty(0, dtype="int64")
+        g = self._groups[code]
+        start, stop = self._span(g, lo, hi)
+        if keep is None:
+            return g.rows[start:min(stop, start + k)]
+
+        found, count, step = [], 0, max(2 * k, 64)
+        while start < stop and count < k:
+            chunk = g.rows[start:min(stop, start + step)]
+            chunk = chunk[keep[chunk]]
+            found.append(chunk)
+            count += len(chunk)
+            start += step
+            step *= 2
+        return np.concatenate(found)[:k] if found else np.empty(0, dtype="int64")
+
+    def aggregate(self, groups=None, lo=-np.inf, hi=np.inf):
+        """Row count and sums per group (all groups, or those in `groups`) over [lo, hi]."""
+        names = self.names if groups is None else [g for g in groups if g in self.code_of]
+        stats = {"group": [], "count": [], "value": [], **{name: [] for name in self.sums}}
+        for name in names:
+            g = self._groups[self.code_of[name]]
+            start, stop = self._span(g, lo, hi)
+            if stop <= start:
+                continue
+            stats["group"].append(name)
+            stats["count"].append(int(stop - start))
+            for column, prefix in g.prefix.items():
+                stats[column].append(prefix[stop] - prefix[start])
+        return pd.DataFrame(stats)
+
+    def top_groups(self, k, groups=None, lo=-np.inf, hi=np.inf, by="sum"):
+        """
+        The `k` groups with the largest summed (by="sum") or mean (by="mean")
+        value over [lo, hi], ties by name; extra columns are aggregated the same way.
+        """
+        agg = self.aggregate(groups, lo, hi)
+        if by == "mean":
+            columns = ["value", *self.sums]
+            agg[columns] = agg[columns].div(agg["count"], axis=0)
+        elif by != "sum":
+            raise ValueError(f"by must be 'sum' or 'mean', not {by!r}")
+        return agg.sort_values(["value", "group"], ascending=[False, True]).head(k).reset_index(drop=True)
+
+    def starts(self, groups, values, sums=None):
+        """True when these columns are this index's rows, possibly followed by more."""
+        n = len(self)
+        if len(values) < n or set(sums or {}) != set(self.sums):
+            return False
+        if not np.array_equal(np.asarray(values[:n], dtype="float64"), self.values, equal_nan=True):
+            return False
+        if any(not np.array_equal(np.asarray(sums[name][:n], dtype="float64"), col, equal_nan=True)
+               for name, col in self.sums.items()):
+            return False
+        if groups is None:
+            return self.names == [None]
+        codes = pd.Index(self.names).get_indexer(pd.Series(groups[:n]))
+        return np.array_equal(codes, self.codes)
+
+    def appended(self, groups, values, sums=None):
+        """
+        A copy with these rows added after the current ones (positions
+        continue from len(self)); groups without new rows are shared.
+        """
+        new = RankingIndex.__new__(RankingIndex)
+        n = len(self)
+        new.values = np.concatenate([self.values, np.asarray(values, dtype="float64")])
+        new.sums = {name: np.concatenate([col, np.asarray(sums[name], dtype="float64")])
+                    for name, col in self.sums.items()}
+        new.names = list(self.names)
+        new.code_of = dict(self.code_of)
+        if groups is None:
+            codes = np.zeros(len(values), dtype="int64")
+        else:
+            groups = pd.Series(groups)
+            seen = groups.notna() & ~groups.isin(new.names)
+            for name in pd.unique(groups[seen]):
+                new.code_of[name] = len(new.names)
+                new.names.append(name)
+            codes = pd.Index(new.names).get_indexer(groups)
+        new.codes = np.concatenate([self.codes, codes.astype("int64")])
+
+        new._groups = list(self._groups) + [None] * (len(new.names) - len(self.names))
+        rows = new._rankable(n)
+        for code in np.unique(new.codes[rows]):
+            added = rows[new.codes[rows] == code]
+            added = added[np.argsort(-new.values[added], kind="stable")]
+            old = self._groups[code] if code < len(self._groups) else None
+            if old is None:
+                merged = added
+            else:
+                # New rows come after every existing row with the same value
+                at = np.searchsorted(old.neg, -new.values[added], side="right")
+                merged = np.insert(old.rows, at, added)
+            new._groups[code] = new._group(merged)
+        new._groups = [g if g is not None else new._group(np.empty(0, dtype="int64")) for g in new._groups]
+        return new
+
+
+# Last index built under each name, so the next version of an append-only
+# file extends it instead of sorting every row again
+_latest = {}
+_latest_lock = threading.Lock()
+
+
+@st.cache_resource(max_entries=4)
+def get_ranking_index(name, version, _groups, _values, _sums=None):
+    """
+    Ranking index `name` for one dataset version, shared by every session.
+    If the version only appended rows to the one last indexed under `name`,
+    that index is extended rather than rebuilt.
+    """
+    with _latest_lock:
+        previous = _latest.get(name)
+    if previous is not None and previous.starts(_groups, _values, _sums):
+        n = len(previous)
+        index = previous.appended(
+            None if _groups is None else _groups[n:], _values[n:],
+            {col: values[n:] for col, values in (_sums or {}).items()},
+        )
+    else:
+        index = RankingIndex(_groups, _values, _sums)
+    with _latest_lock:
+        _latest[name] = index
+    return index
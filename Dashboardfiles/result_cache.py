@@ -0,0 +1,248 @@
+import functools
+import hashlib
+import inspect
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import query_engine
+import schemas
+from data_loader import CACHE_DIR, CATEGORY_MAX_RATIO, SNAPSHOT_FORMAT, on_refresh
+
+#############################
+# Persistent result cache
+#############################
+
+# st.cache_data lives in worker memory and is empty after every restart or
+# deploy. Functions wrapped with `persistent` also keep their frames on disk
+# as Arrow files, so a fresh worker reads yesterday's rollups instead of
+# recomputing them. Stack it under st.cache_data: memory first, then disk,
+# then the computation.
+#
+#     @st.cache_data
+#     @result_cache.persistent()
+#     def state_max(version, _df): ...
+#
+# The first argument is the dataset version (a `file_key`). Entries are keyed
+# on a fingerprint of the file's *content* (so a redeploy that copies the
+# file with a new mtime still hits), the function, the source of its module
+# and of every app module that one reaches (the helpers it calls, the
+# loader and schemas), the loader / backend settings, and the other
+# arguments; arguments starting with "_" are left out, as in Streamlit.
+# A deploy that changes any of that code or settings starts new entries.
+
+RESULT_CACHE_DIR = os.environ.get("DASHBOARD_RESULT_CACHE_DIR", os.path.join(CACHE_DIR, "results"))
+RESULT_CACHE_BYTES = int(float(os.environ.get("DASHBOARD_RESULT_CACHE_MB", 256)) * 2 ** 20)
+
+# Bump to retire every stored entry (e.g. when the stored layout changes)
+RESULT_CACHE_FORMAT = 2
+# File versions whose content hash is kept in memory
+FINGERPRINTS_KEPT = 16
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_lock = threading.Lock()
+_fingerprints = OrderedDict()
+_sources = {}   # (path, mtime_ns, size) -> source hash
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+def fingerprint(version):
+    """Content hash of the file behind a `file_key`, computed once per version."""
+    with _lock:
+        if version in _fingerprints:
+            _fingerprints.move_to_end(version)
+            return _fingerprints[version]
+    digest = hashlib.sha1()
+    with open(version[0], "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _lock:
+        _fingerprints[version] = value
+        while len(_fingerprints) > FINGERPRINTS_KEPT:
+            _fingerprints.popitem(last=False)
+    # Later versions of the file are hashed by the background refresher
+    # before they go live, not by the first rerun that asks
+    on_refresh(version[0], fingerprint)
+    return value
+
+
+def settings():
+    """Settings outside the code that change stored results."""
+    return (
+        RESULT_CACHE_FORMAT,
+        SNAPSHOT_FORMAT,
+        CATEGORY_MAX_RATIO,
+        repr(sorted(schemas.SCHEMAS.items())),
+        "duckdb" if query_engine.enabled() else "pandas",
+    )
+
+
+def _app_modules(namespace, seen):
+    # App modules (files in this directory) reachable from `namespace`
+    # through the modules and functions it names, depth first
+    for value in list(namespace.values()):
+        module = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+        path = getattr(module, "__file__", None)
+        if not path or os.path.dirname(os.path.abspath(path)) != APP_DIR:
+            continue
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            _app_modules(vars(module), seen)
+    return seen
+
+
+def source_key(func):
+    """Hash of the source of `func`'s module and every app module it reaches."""
+    paths = _app_modules(func.__globals__, set())
+    own = func.__globals__.get("__file__")
+    if own:
+        paths.add(os.path.abspath(own))
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in _sources:
+            with open(path, "rb") as f:
+                _sources[key] = hashlib.sha1(f.read()).hexdigest()
+        digest.update(f"{os.path.basename(path)}:{_sources[key]}".encode())
+    return digest.hexdigest()
+
+
+def _stable(value):
+    # repr() of a large array is abbreviated with "...", key on its bytes instead
+    if isinstance(value, np.ndarray):
+        return ("ndarray", str(value.dtype), value.shape, hashlib.sha1(value.tobytes()).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return tuple(_stable(v) for v in value)
+    return value
+
+
+def entry_path(version, operation, params):
+    key = hashlib.sha1(f"{fingerprint(version)}|{operation}|{_stable(params)!r}".encode()).hexdigest()
+    return os.path.join(RESULT_CACHE_DIR, f"{key}.arrow")
+
+
+def _read(path):
+    import pyarrow.feather as feather
+
+    frame = feather.read_table(path).to_pandas()
+    if list(frame.columns) == ["__series__"]:
+        frame = frame["__series__"].rename(frame.attrs.pop("series_name", None))
+    # Reading refreshes the access time used for LRU eviction
+    os.utime(path)
+    return frame
+
+
+def _write(path, result):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    frame = result
+    if isinstance(result, pd.Series):
+        frame = result.to_frame("__series__")
+        frame.attrs = {**result.attrs, "series_name": result.name}
+    os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    feather.write_feather(pa.Table.from_pandas(frame), tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+
+def evict(budget=RESULT_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits in `budget` bytes."""
+    try:
+        names = [n for n in os.listdir(RESULT_CACHE_DIR) if n.endswith(".arrow")]
+    except FileNotFoundError:
+        return
+    entries = []
+    for name in names:
+        path = os.path.join(RESULT_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        with _lock:
+            _stats["evictions"] += 1
+
+
+def get_or_compute(version, operation, params, compute):
+    """`compute()` through the disk cache; only frames and series are stored."""
+    try:
+        path = entry_path(version, operation, params)
+    except OSError:
+        return compute()
+    try:
+        result = _read(path)
+    except Exception:
+        # Missing, or truncated / unreadable: recompute and overwrite it
+        pass
+    else:
+        with _lock:
+            _stats["hits"] += 1
+        return result
+
+    with _lock:
+        _stats["misses"] += 1
+    result = compute()
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        try:
+            _write(path, result)
+        except (ImportError, ValueError, TypeError, OSError):
+            # No pyarrow, a column Arrow can't store, or a read-only disk
+            return result
+        with _lock:
+            _stats["writes"] += 1
+        evict()
+    return result
+
+
+def persistent(operation=None):
+    """Decorator: keep the function's results in the on-disk cache (see above)."""
+    def wrap(func):
+        signature = inspect.signature(func)
+        name = operation or func.__qualname__
+        code = source_key(func)
+
+        @functools.wraps(func)
+        def inner(version, *args, **kwargs):
+            bound = signature.bind(version, *args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(
+                (key, value) for key, value in list(bound.arguments.items())[1:]
+                if not key.startswith("_")
+            )
+            return get_or_compute(
+                version, f"{name}:{code}:{settings()!r}", params, lambda: func(version, *args, **kwargs)
+            )
+        return inner
+    return wrap
+
+
+def stats():
+    """Hit / miss / write / eviction counts for this process and the bytes on disk."""
+    with _lock:
+        out = dict(_stats)
+    try:
+        out["bytes"] = sum(
+            os.path.getsize(os.path.join(RESULT_CACHE_DIR, n))
+            for n in os.listdir(RESULT_CACHE_DIR) if n.endswith(".arrow")
+        )
+    except OSError:
+        out["bytes"] = 0
+    return out
@@ -0,0 +1,140 @@
+import pandas as pd
+import streamlit as st
+
+from data_loader import dataset_version, load_shared, on_refresh
+import query_engine
+import result_cache
+
+#############################
+# Uber rollup cube
+#############################
+
+# One row per (day, vehicle type, payment method, cancellation reasons) with
+# additive measures. Every KPI and grouped panel on the Uber dashboard can be
+# answered from these sums and counts, so a rerun touches a few thousand
+# groups instead of every booking.
+UBER_KEYS = [
+    "date",
+    "vehicle_type",
+    "payment_method",
+    "reason_for_cancelling_by_customer",
+    "driver_cancellation_reason",
+]
+
+
+def build_uber_rollup(df):
+    """Collapse the bookings frame (typed at ingest) into the rollup cube."""
+    base = pd.DataFrame({
+        "date": df["date"].dt.normalize(),
+        "vehicle_type": df["vehicle_type"],
+        "payment_method": df["payment_method"],
+        "reason_for_cancelling_by_customer": df["reason_for_cancelling_by_customer"],
+        "driver_cancellation_reason": df["driver_cancellation_reason"],
+        "booking_id": df["booking_id"],
+        "booking_value": df["booking_value"],
+        "customer_rating": df["customer_rating"],
+        "cancelled_rides_by_customer": df["cancelled_rides_by_customer"],
+    })
+    # sort=False keeps groups in order of first appearance, so unique() on a
+    # key column lists values in the same order as on the raw frame
+    cube = base.groupby(UBER_KEYS, dropna=False, sort=False, observed=True).agg(
+        rows=("booking_id", "size"),
+        booking_id_count=("booking_id", "count"),
+        booking_value_sum=("booking_value", "sum"),
+        booking_value_count=("booking_value", "count"),
+        customer_rating_sum=("customer_rating", "sum"),
+        customer_rating_count=("customer_rating", "count"),
+        cancelled_rides_by_customer_sum=("cancelled_rides_by_customer", "sum"),
+    ).reset_index()
+
+    # Distinct booking ids is not additive across groups, keep it as a scalar
+    cube.attrs["unique_bookings"] = int(df["booking_id"].nunique())
+    return cube
+
+
+@result_cache.persistent()
+def _stored_rollup(version):
+    # Kept on disk too, so a restarted worker doesn't rebuild it
+    df = load_shared(version[0], version=version)
+    if query_engine.enabled():
+        return query_engine.uber_rollup(query_engine.parquet_source(version, df, "uber"))
+    return build_uber_rollup(df)
+
+
+@st.cache_data(show_spinner="Building rollups...", max_entries=4)
+def _cached_rollup(path, mtime_ns, size):
+    return _stored_rollup((path, mtime_ns, size))
+
+
+def _warm_rollup(version):
+    _cached_rollup(*version)
+
+
+def load_uber_rollup(path, version=None):
+    """Rollup cube for `path`, rebuilt only when the file changes."""
+    # A refreshed file gets its cube built in the background before going live
+    on_refresh(path, _warm_rollup)
+    return _cached_rollup(*(version or dataset_version(path)))
+
+
+#############################
+# Panel queries
+#############################
+
+def kpis(cube, df=None):
+    """
+    Header KPIs from the cube. Distinct bookings aren't additive, so they
+    come from the cube's attrs; if a cube lost them, `df` (the bookings the
+    cube was built from) is counted instead, and without it this raises.
+    """
+    unique = cube.attrs.get("unique_bookings")
+    if unique is None:
+        if df is None:
+            raise ValueError("rollup cube has no unique_bookings; pass the bookings frame to count them")
+        unique = int(df["booking_id"].nunique())
+    return {
+        "unique_bookings": unique,
+        "avg_rating": cube["customer_rating_sum"].sum() / cube["customer_rating_count"].sum(),
+        "avg_booking_value": cube["booking_value_sum"].sum() / cube["booking_value_count"].sum(),
+        "vehicle_types": int(cube["vehicle_type"].nunique()),
+    }
+
+
+def avg_rating_by_vehicle(cube):
+    sums = cube.groupby("vehicle_type", as_index=False, observed=True)[["customer_rating_sum", "customer_rating_count"]].sum()
+    sums["avg_rating"] = sums["customer_rating_sum"] / sums["customer_rating_count"]
+    return sums[["vehicle_type", "avg_rating"]].sort_values("avg_rating", ascending=True)
+
+
+def bookings_per_day(cube):
+    # Kept as datetime64 (no per-row Python date objects)
+    per_day = cube.groupby("date", observed=True)["booking_id_count"].sum()
+    return per_day.rename("bookings").reset_index()
+
+
+def rating_count_by_payment(cube):
+    return (
+        cube.groupby("payment_method", as_index=False, observed=True)["customer_rating_count"].sum()
+        .rename(columns={"customer_rating_count": "count_customer_rating"})
+        .sort_values("count_customer_rating", ascending=True)
+    )
+
+
+def booking_count_by_vehicle(cube):
+    return (
+        cube.groupby("vehicle_type", as_index=False, observed=True)["booking_value_count"].sum()
+        .rename(columns={"booking_value_count": "avg_value"})
+    )
+
+
+def customer_cancellations_by_vehicle(cube):
+    return (
+        cube.groupby(["vehicle_type", "reason_for_cancelling_by_customer"], as_index=False, dropna=False, observed=True)[
+            "cancelled_rides_by_customer_sum"
+        ].sum()
+        .rename(columns={"cancelled_rides_by_customer_sum": "cancelled_rides_by_customer"})
+    )
+
+
+def unique_values(cube, column):
+    return cube[column].unique()
@@ -0,0 +1,105 @@
+import math
+import os
+
+import numpy as np
+import streamlit as st
+
+#############################
+# Large scatter plots
+#############################
+
+# Two levels of detail for scatters over whole datasets:
+#   - above WEBGL_MIN_POINTS, plotly draws with WebGL (Scattergl) instead of SVG
+#   - above the point budget, rows are thinned on the server with a grid
+#     sample that follows the density and keeps every sparse/outlying point
+
+WEBGL_MIN_POINTS = 1000
+# Default budget; the sidebar knob (`budget_knob`) overrides it per session
+POINT_BUDGET = int(os.environ.get("DASHBOARD_SCATTER_BUDGET", 20_000))
+BUDGET_STEPS = [1_000, 5_000, 10_000, 20_000, 50_000, 100_000, 250_000]
+
+# Grid cells holding this many points or fewer are kept whole: those are
+# the outliers and thin tails a uniform sample would drop first
+SPARSE_CELL_MAX = 2
+
+
+def render_mode(n):
+    """`render_mode` for plotly express scatters of n points."""
+    return "webgl" if n > WEBGL_MIN_POINTS else "svg"
+
+
+def scatter_trace(n):
+    """go.Scatter, or its WebGL twin for n points past the threshold."""
+    import plotly.graph_objects as go
+
+    return go.Scattergl if n > WEBGL_MIN_POINTS else go.Scatter
+
+
+def _normalized(values, finite):
+    values = np.asarray(values, dtype="float64")
+    lo, hi = values[finite].min(), values[finite].max()
+    return (values - lo) / (hi - lo) if hi > lo else np.zeros_like(values)
+
+
+def grid_sample(x, y, budget, seed=0):
+    """
+    Row positions of about `budget` points that preserve the x/y density.
+
+    Points are bucketed into a grid over the data extent. Sparse cells and
+    the four extreme points are kept as-is; the rest of the budget is split
+    across dense cells in proportion to their counts, sampled at random
+    (fixed seed, so reruns draw the same points).
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    finite = np.isfinite(x) & np.isfinite(y)
+    rows = np.flatnonzero(finite)
+    if len(rows) <= budget:
+        return rows
+
+    side = max(8, int(math.sqrt(budget) / 2))
+    gx = np.minimum((_normalized(x, finite)[rows] * side).astype("int64"), side - 1)
+    gy = np.minimum((_normalized(y, finite)[rows] * side).astype("int64"), side - 1)
+    cell = gx * side + gy
+
+    _, inverse, counts = np.unique(cell, return_inverse=True, return_counts=True)
+    sparse = counts <= SPARSE_CELL_MAX
+    extremes = [x[rows].argmin(), x[rows].argmax(), y[rows].argmin(), y[rows].argmax()]
+
+    # Per-cell quota: everything in sparse cells, a proportional share elsewhere
+    left = max(budget - int(counts[sparse].sum()), int((~sparse).sum()))
+    dense_total = int(counts[~sparse].sum())
+    quota = np.where(sparse, counts, np.maximum(1, counts * left // max(dense_total, 1)))
+
+    # Random rank within each cell, keep the first `quota` of every cell
+    rank = np.random.default_rng(seed).random(len(rows))
+    order = np.lexsort((rank, inverse))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    position = np.arange(len(order)) - starts[inverse[order]]
+    keep = order[position < quota[inverse[order]]]
+
+    return rows[np.union1d(keep, extremes)]
+
+
+@st.cache_data(max_entries=32)
+def cached_sample(version, x, y, budget, filter_key, _df):
+    """`grid_sample` of `_df[x]` / `_df[y]`, keyed on file version and filters."""
+    return grid_sample(_df[x].to_numpy(), _df[y].to_numpy(), budget)
+
+
+def thin(df, x, y, budget, version=None, filter_key=None):
+    """`df` itself when it fits the budget, else its grid-sampled rows."""
+    if len(df) <= budget:
+        return df
+    if version is None:
+        return df.iloc[grid_sample(df[x].to_numpy(), df[y].to_numpy(), budget)]
+    return df.iloc[cached_sample(version, x, y, budget, filter_key, df)]
+
+
+def budget_knob(container=st.sidebar):
+    """Sidebar control for the per-chart point budget."""
+    default = min(BUDGET_STEPS, key=lambda step: abs(step - POINT_BUDGET))
+    return container.select_slider(
+        "Scatter point budget", options=BUDGET_STEPS, value=default,
+        help="Scatters with more points than this are thinned on the server.",
+    )
@@ -0,0 +1,265 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+#############################
+# Declared dataset schemas
+#############################
+
+# Each dataset declares its column types, datetime formats and which columns
+# may be empty. `read_typed` parses a file against its schema once, at ingest,
+# with pyarrow's multithreaded CSV reader and the formats given here (no
+# per-value format guessing). Rows that don't fit are dropped and listed in a
+# rejected-rows report instead of turning into NaN somewhere in a chart, so
+# the dashboards can treat every declared column as already typed.
+#
+# Columns that aren't declared are read as the parser infers them.
+
+
+@dataclass(frozen=True)
+class Field:
+    name: str
+    dtype: str              # "string", "float64", "int64" or "datetime"
+    format: Optional[str] = None   # strptime format of a "datetime" column
+    nullable: bool = True
+
+
+# Keyed on the file name without extension, so a dataset converted to
+# parquet / feather keeps its schema
+SCHEMAS = {
+    "newuber": (
+        Field("date", "datetime", "%Y-%m-%d"),
+        Field("time", "string"),   # "HH:MM:SS" or a 1900-01-01 timestamp, kept as written
+        Field("booking_id", "string", nullable=False),
+        Field("booking_status", "string"),
+        Field("customer_id", "string"),
+        Field("vehicle_type", "string"),
+        Field("pickup_location", "string"),
+        Field("drop_location", "string"),
+        Field("avg_vtat", "float64"),
+        Field("avg_ctat", "float64"),
+        Field("cancelled_rides_by_customer", "float64"),
+        Field("reason_for_cancelling_by_customer", "string"),
+        Field("cancelled_rides_by_driver", "float64"),
+        Field("driver_cancellation_reason", "string"),
+        Field("incomplete_rides", "float64"),
+        Field("incomplete_rides_reason", "string"),
+        Field("booking_value", "float64"),
+        Field("ride_distance", "float64"),
+        Field("driver_ratings", "float64"),
+        Field("customer_rating", "float64"),
+        Field("payment_method", "string"),
+    ),
+    "worldnew": (
+        Field("city", "string"),
+        Field("city_ascii", "string"),
+        Field("lat", "float64", nullable=False),
+        Field("lng", "float64", nullable=False),
+        Field("country", "string"),
+        Field("iso2", "string"),
+        Field("iso3", "string"),
+        Field("admin_name", "string"),
+        Field("capital", "string"),
+        Field("population", "float64", nullable=False),
+    ),
+    "Adidas": (
+        Field("Retailer", "string"),
+        Field("RetailerID", "int64"),
+        Field("InvoiceDate", "datetime", "%Y-%m-%d", nullable=False),
+        Field("Region", "string"),
+        Field("State", "string"),
+        Field("City", "string"),
+        Field("Product", "string"),
+        Field("PriceperUnit", "float64"),
+        Field("UnitsSold", "int64"),
+        Field("TotalSales", "float64"),
+        Field("OperatingProfit", "float64"),
+        Field("OperatingMargin", "float64"),
+        Field("SalesMethod", "string"),
+    ),
+}
+
+# `row` is the 0-based position in the frame as parsed, before rejected rows
+# are dropped (values that failed to convert); `line` the 1-based line in
+# the file (malformed rows, which never became frame rows). Each entry has
+# one of the two.
+REJECTED_COLUMNS = ["row", "line", "column", "value", "reason"]
+
+
+def rejected_frame(records=()):
+    """Rejected-rows report from (row, line, column, value, reason) tuples."""
+    return pd.DataFrame(list(records), columns=REJECTED_COLUMNS).astype({"row": "Int64", "line": "Int64"})
+
+
+def schema_for(path):
+    """Declared fields of the dataset at `path`, or None."""
+    return SCHEMAS.get(os.path.splitext(os.path.basename(path))[0])
+
+
+def _arrow_type(field):
+    import pyarrow as pa
+
+    return {
+        "string": pa.string(),
+        "float64": pa.float64(),
+        "int64": pa.int64(),
+        "datetime": pa.timestamp("ns"),
+    }[field.dtype]
+
+
+def _pandas_names(columns):
+    # Blank headers (a written index) get read_csv's "Unnamed: i" names
+    return [name if name else f"Unnamed: {i}" for i, name in enumerate(columns)]
+
+
+def _read_csv_arrow(path, fields):
+    """
+    Parse `path` with pyarrow straight into the declared types. Returns
+    (frame, malformed rows). Raises pyarrow.ArrowInvalid when a value
+    doesn't convert.
+    """
+    import pyarrow.csv as pacsv
+
+    malformed = []
+
+    def skip(row):
+        malformed.append((row.number, row.text))
+        return "skip"
+
+    formats = sorted({f.format for f in fields if f.format})
+    convert = pacsv.ConvertOptions(
+        column_types={f.name: _arrow_type(f) for f in fields},
+        timestamp_parsers=formats or None,
+        strings_can_be_null=True,   # empty text is missing, as in read_csv
+    )
+    table = pacsv.read_csv(
+        path,
+        parse_options=pacsv.ParseOptions(invalid_row_handler=skip),
+        convert_options=convert,
+    )
+    df = table.to_pandas()
+    df.columns = _pandas_names(df.columns)
+    return df, malformed
+
+
+def _number_lines(path, malformed):
+    # pyarrow only numbers skipped rows when it parses on a single thread;
+    # find the others' file lines by their text (one pass, only when needed)
+    wanted = {text for number, text in malformed if number is None}
+    if not wanted:
+        return malformed
+    found = {}
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        for number, line in enumerate(f, 1):
+            text = line.rstrip("\r\n")
+            if text in wanted:
+                found.setdefault(text, []).append(number)
+    return [
+        (found[text].pop(0) if number is None and found.get(text) else number, text)
+        for number, text in malformed
+    ]
+
+
+def _read_csv_text(path, fields):
+    """The declared columns as text, the others inferred; for reporting bad values."""
+    import pyarrow as pa
+
+    typed = [Field(f.name, "string", nullable=f.nullable) for f in fields]
+    try:
+        return _read_csv_arrow(path, typed)
+    except pa.ArrowInvalid:
+        # Undeclared columns that pyarrow infers wrongly: fall back to pandas
+        return pd.read_csv(path, dtype={f.name: str for f in fields}), []
+
+
+def coerce(df, fields):
+    """
+    Convert the declared columns of `df` with the declared types and formats.
+    Returns (frame, rejected) where rejected lists (row position, column,
+    raw value, reason) for values that didn't convert and nulls in required
+    columns; those rows are dropped from the frame.
+    """
+    missing = [f.name for f in fields if f.name not in df.columns]
+    if missing:
+        raise ValueError(f"missing declared columns {missing}")
+
+    converted = {}
+    bad = np.zeros(len(df), dtype=bool)
+    rejected = []
+    for field in fields:
+        raw = df[field.name]
+        col = raw
+        if field.dtype == "datetime" and not pd.api.types.is_datetime64_any_dtype(raw):
+            col = pd.to_datetime(raw, format=field.format, errors="coerce")
+        elif field.dtype in ("float64", "int64") and not pd.api.types.is_numeric_dtype(raw):
+            col = pd.to_numeric(raw, errors="coerce")
+        elif field.dtype == "string" and pd.api.types.is_numeric_dtype(raw):
+            col = raw.astype(object).where(raw.notna())
+        if field.dtype == "int64" and col.dtype.kind == "f" and col.notna().all():
+            col = col.astype("int64")
+        elif field.dtype == "float64" and col.dtype.kind in "iu":
+            col = col.astype("float64")
+        failed = np.zeros(len(df), dtype=bool)
+        if col is not raw:
+            converted[field.name] = col
+            failed = (col.isna() & raw.notna()).to_numpy()
+            if failed.any():
+                rejected.append((np.flatnonzero(failed), field.name, raw[failed], "invalid " + field.dtype))
+        if not field.nullable:
+            empty = raw.isna().to_numpy()
+            if empty.any():
+                rejected.append((np.flatnonzero(empty), field.name, raw[empty], "missing value"))
+            failed |= empty
+        bad |= failed
+
+    if converted:
+        df = df.assign(**converted)
+    report = rejected_frame(
+        (int(row), None, name, None if pd.isna(value) else str(value), reason)
+        for rows, name, values, reason in rejected
+        for row, value in zip(rows, values)
+    )
+    if bad.any():
+        df = df[~bad].reset_index(drop=True)
+    return df, report.sort_values("row", kind="stable", ignore_index=True)
+
+
+def read_typed(path, fields, reader=None, **read_kwargs):
+    """
+    Parse `path` against `fields`: (typed frame, rejected-rows report).
+
+    Plain CSVs go through pyarrow with the declared column types. If any
+    value fails to convert, the declared columns are re-read as text and
+    converted column by column so every bad value can be reported. Other
+    formats (or read options pyarrow doesn't take) are read by `reader`
+    and converted the same way.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv" and not read_kwargs:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            pass
+        else:
+            try:
+                df, malformed = _read_csv_arrow(path, fields)
+                report = rejected_frame()
+            except pa.ArrowInvalid:
+                df, malformed = _read_csv_text(path, fields)
+                df, report = coerce(df, fields)
+            else:
+                # Typed already; this only checks the required columns
+                df, report = coerce(df, fields)
+            if malformed:
+                # Rows with the wrong number of fields never reached the frame
+                skipped = rejected_frame(
+                    (None, number, None, text, "malformed row")
+                    for number, text in _number_lines(path, malformed)
+                )
+                report = pd.concat([skipped, report], ignore_index=True) if len(report) else skipped
+            return df, report
+
+    return coerce(reader(path, **read_kwargs), fields)
@@ -0,0 +1,118 @@
+import numpy as np
+import streamlit as st
+
+#############################
+# Lat/lng grid index
+#############################
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = np.pi * EARTH_RADIUS_KM / 180.0
+
+# Below this many candidate points (after the filter mask) a plain
+# vectorized scan beats the cell lookups
+BRUTE_FORCE_MAX = 2_000
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km (works on scalars and numpy arrays)."""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SpatialIndex:
+    """
+    Bucket points into fixed lat/lng cells so radius queries only measure
+    distances for points in the cells that overlap the search circle.
+
+    Rows are positional (0..n-1) in the arrays the index was built from,
+    so one index over the full dataset serves every filter: pass the filter
+    as a boolean `mask` to `query_radius`.
+    """
+
+    def __init__(self, lat, lng, cell_deg=1.0):
+        self.lat = np.asarray(lat, dtype="float64")
+        self.lng = np.asarray(lng, dtype="float64")
+        self.cell_deg = float(cell_deg)
+        self.n_rows = int(np.ceil(180.0 / self.cell_deg))
+        self.n_cols = int(np.ceil(360.0 / self.cell_deg))
+
+        cells = self._cell_ids(self._row_of(self.lat), self._col_of(self.lng))
+        self.order = np.argsort(cells, kind="stable")
+        self.sorted_cells = cells[self.order]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _row_of(self, lat):
+        return np.clip(((np.asarray(lat) + 90.0) // self.cell_deg).astype("int64"), 0, self.n_rows - 1)
+
+    def _col_of(self, lng):
+        return (((np.asarray(lng) + 180.0) // self.cell_deg).astype("int64")) % self.n_cols
+
+    def _cell_ids(self, rows, cols):
+        return rows * self.n_cols + cols
+
+    def _candidates(self, lat0, lng0, km):
+        """Row ids of every point in a cell that may lie within `km`."""
+        dlat = km / KM_PER_DEG_LAT
+        lat_lo, lat_hi = max(lat0 - dlat, -90.0), min(lat0 + dlat, 90.0)
+        # Longitude span widens towards the poles; near them take whole rows
+        widest = max(abs(lat_lo), abs(lat_hi))
+        if widest >= 89.0:
+            dlng = 180.0
+        else:
+            dlng = dlat / np.cos(np.radians(widest))
+
+        r0, r1 = int(self._row_of(lat_lo)), int(self._row_of(lat_hi))
+        # Once the span (plus a cell for the partial ones at its ends) covers
+        # the globe, both ends wrap onto the same columns: take every column
+        if 2 * dlng + self.cell_deg >= 360.0:
+            col_ranges = [(0, self.n_cols - 1)]
+        else:
+            c0, c1 = int(self._col_of(lng0 - dlng)), int(self._col_of(lng0 + dlng))
+            # Circle crossing the antimeridian covers two column ranges
+            col_ranges = [(c0, c1)] if c0 <= c1 else [(c0, self.n_cols - 1), (0, c1)]
+
+        chunks = []
+        for r in range(r0, r1 + 1):
+            for c0, c1 in col_ranges:
+                lo = np.searchsorted(self.sorted_cells, self._cell_ids(r, c0), side="left")
+                hi = np.searchsorted(self.sorted_cells, self._cell_ids(r, c1), side="right")
+                if hi > lo:
+                    chunks.append(self.order[lo:hi])
+        if not chunks:
+            return np.empty(0, dtype="int64")
+        return np.concatenate(chunks)
+
+    def query_radius(self, lat0, lng0, km, mask=None):
+        """
+        Rows within `km` of (lat0, lng0), nearest first.
+
+        Returns (rows, distances_km). `mask` is an optional boolean array over
+        the indexed rows; rows where it is False are skipped.
+        """
+        if mask is None:
+            rows = np.arange(len(self)) if len(self) <= BRUTE_FORCE_MAX else None
+        else:
+            mask = np.asarray(mask)
+            # Decided on the filtered count: a narrow filter scans its own rows
+            rows = np.flatnonzero(mask) if np.count_nonzero(mask) <= BRUTE_FORCE_MAX else None
+        if rows is None:
+            rows = self._candidates(lat0, lng0, km)
+            if mask is not None:
+                rows = rows[mask[rows]]
+
+        dist = haversine_km(lat0, lng0, self.lat[rows], self.lng[rows])
+        keep = dist <= km
+        rows, dist = rows[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return rows[order], dist[order]
+
+
+@st.cache_resource(max_entries=4)
+def get_spatial_index(version, _lat, _lng):
+    """One index per dataset version, shared by every session and filter."""
+    return SpatialIndex(_lat, _lng)
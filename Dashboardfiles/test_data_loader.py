@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import ReadOnlyDatasetError, freeze
+
+
+@pytest.fixture
+def shared():
+    return freeze(pd.DataFrame({"a": [1.0, 2.0], "b": ["x", "y"]}))
+
+
+def test_rename_inplace_leaves_columns_alone(shared):
+    with pytest.raises(ReadOnlyDatasetError):
+        shared.rename(columns={"a": "renamed"}, inplace=True)
+    assert list(shared.columns) == ["a", "b"]
+
+
+def test_replacing_axes_raises(shared):
+    with pytest.raises(ReadOnlyDatasetError):
+        shared.columns = ["c", "d"]
+    with pytest.raises(ReadOnlyDatasetError):
+        shared.index = [10, 11]
+    assert list(shared.columns) == ["a", "b"]
+    assert list(shared.index) == [0, 1]
+
+
+@pytest.mark.parametrize("call", [
+    lambda df: df.reset_index(inplace=True),
+    lambda df: df.set_index("b", inplace=True),
+    lambda df: df.set_axis(["c", "d"], axis=1, inplace=True),
+    lambda df: df.drop(columns="a", inplace=True),
+    lambda df: df.fillna(0, inplace=True),
+])
+def test_inplace_methods_raise(shared, call):
+    with pytest.raises(ReadOnlyDatasetError):
+        call(shared)
+    assert list(shared.columns) == ["a", "b"]
+    assert list(shared.index) == [0, 1]
+
+
+def test_derived_frames_are_writable(shared):
+    renamed = shared.rename(columns={"a": "c"})
+    renamed["d"] = 1
+    assert list(shared.columns) == ["a", "b"]
+    assert not isinstance(shared.reset_index(), type(shared))
+
+
+def test_cell_writes_raise(shared):
+    with pytest.raises((ValueError, ReadOnlyDatasetError)):
+        shared.loc[0, "a"] = np.nan
+    assert shared.loc[0, "a"] == 1.0
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from spatial_index import SpatialIndex, haversine_km
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    lat = np.concatenate([rng.uniform(40, 75, 20_000), rng.uniform(-89.9, 89.9, 20_000)])
+    lng = rng.uniform(-180, 180, len(lat))
+    return lat, lng, SpatialIndex(lat, lng)
+
+
+@pytest.mark.parametrize("lat0, lng0, km", [
+    (54.395, 1.8, 3000),      # wide radius at high latitude: span just under the globe
+    (70.0, 10.0, 2500),
+    (88.0, 0.0, 500),         # near the pole
+    (10.0, 179.5, 1500),      # across the antimeridian
+    (-20.0, -179.9, 3000),
+    (0.0, 0.0, 50),
+])
+def test_query_radius_matches_brute_force(points, lat0, lng0, km):
+    lat, lng, index = points
+    rows, dist = index.query_radius(lat0, lng0, km)
+    expected = np.flatnonzero(haversine_km(lat0, lng0, lat, lng) <= km)
+    assert np.array_equal(np.sort(rows), expected)
+    assert np.all(np.diff(dist) >= 0)
+
+
+def test_query_radius_with_mask(points):
+    lat, lng, index = points
+    mask = np.zeros(len(lat), dtype=bool)
+    mask[::3] = True
+    rows, _ = index.query_radius(54.395, 1.8, 3000, mask)
+    expected = np.flatnonzero(mask & (haversine_km(54.395, 1.8, lat, lng) <= 3000))
+    assert np.array_equal(np.sort(rows), expected)
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import result_cache
+
+#############################
+# Time-series preparation for line / area charts
+#############################
+
+# Charts over raw timestamped rows send every row and let the browser draw
+# thousands of overlapping points. Here series are
+#   1. bucketed at a granularity picked from the date span,
+#   2. aggregated in one grouping pass for all measures,
+#   3. thinned with Largest-Triangle-Three-Buckets if still too dense,
+# so each chart gets at most `target_points` points with its peaks intact.
+
+TARGET_POINTS = 1000
+
+# (label, offset, approximate length) from finest to coarsest. End-anchored
+# offsets, like resample("M"), so buckets are labelled by their last day.
+GRANULARITIES = [
+    ("hour", pd.offsets.Hour(), pd.Timedelta(hours=1)),
+    ("day", pd.offsets.Day(), pd.Timedelta(days=1)),
+    ("week", pd.offsets.Week(weekday=6), pd.Timedelta(days=7)),
+    ("month", pd.offsets.MonthEnd(), pd.Timedelta(days=30.44)),
+    ("quarter", pd.offsets.QuarterEnd(startingMonth=12), pd.Timedelta(days=91.31)),
+    ("year", pd.offsets.YearEnd(), pd.Timedelta(days=365.25)),
+]
+
+
+def pick_granularity(start, end, target_points=TARGET_POINTS):
+    """Finest granularity giving at most `target_points` buckets over [start, end]."""
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for label, offset, length in GRANULARITIES:
+        if span / length <= target_points:
+            return label, offset
+    return GRANULARITIES[-1][:2]
+
+
+def resample(df, on, aggs, freq):
+    """
+    All of `aggs` per `freq` bucket of `df[on]` in one grouping pass.
+
+    `aggs` uses named-aggregation form, {output: (column, func)}; the old
+    one-resample-per-measure + concat pattern becomes a single call.
+    """
+    return df.groupby(pd.Grouper(key=on, freq=freq)).agg(**aggs)
+
+
+def lttb(x, y, threshold):
+    """
+    Positions of `threshold` points chosen by Largest-Triangle-Three-Buckets.
+
+    First and last points are always kept. Every bucket in between keeps the
+    point forming the largest triangle with the previously kept point and
+    the next bucket's average, which keeps spikes that averaging would flatten.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype("int64")
+    keep = np.empty(threshold, dtype="int64")
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(frame, columns, target_points=TARGET_POINTS):
+    """
+    `frame` (indexed by time) thinned with LTTB per column; the union of the
+    kept rows, so each series keeps its own peaks.
+    """
+    if len(frame) <= target_points:
+        return frame
+    x = frame.index.asi8 if isinstance(frame.index, pd.DatetimeIndex) else frame.index.to_numpy()
+    per_series = max(3, target_points // max(len(columns), 1))
+    keep = set()
+    for column in columns:
+        y = frame[column].to_numpy(dtype="float64")
+        valid = np.flatnonzero(np.isfinite(y))
+        keep.update(valid[lttb(x[valid], y[valid], per_series)].tolist())
+    return frame.iloc[sorted(keep)]
+
+
+def prepare_series(df, on, aggs, freq=None, target_points=TARGET_POINTS):
+    """
+    Chart-ready series of `aggs` over `df[on]`: bucketed at `freq` (picked
+    from the span when None), then LTTB-thinned to `target_points`.
+    Returns (frame indexed by bucket, granularity label).
+    """
+    label = None
+    if freq is None:
+        dates = df[on].dropna()
+        if dates.empty:
+            return resample(df, on, aggs, pd.offsets.Day()), "day"
+        label, freq = pick_granularity(dates.min(), dates.max(), target_points)
+    series = resample(df, on, aggs, freq)
+    return downsample(series, list(aggs), target_points), label
+
+
+@result_cache.persistent()
+def _stored_series(version, on, aggs, freq, target_points, filter_key, _df):
+    series, label = prepare_series(_df, on, dict(aggs), freq, target_points)
+    series.attrs["granularity"] = label
+    return series
+
+
+@st.cache_data(max_entries=32)
+def cached_series(version, on, aggs, freq, target_points, filter_key, _df):
+    """
+    `prepare_series` keyed on file version and filters (aggs as a tuple of
+    items); also kept in the on-disk result cache.
+    """
+    series = _stored_series(version, on, aggs, freq, target_points, filter_key, _df)
+    return series, series.attrs.get("granularity")
@@ -0,0 +1,102 @@
+import importlib
+import logging
+import threading
+
+import streamlit as st
+
+import datasets
+import query_engine
+import rollup
+from data_loader import dataset_version, rejected_rows
+from filter_index import get_filter_index
+from map_lod import get_cluster_index
+from ranking_index import get_ranking_index
+from spatial_index import get_spatial_index
+
+#############################
+# Warm-up
+#############################
+
+# Builds what the pages would otherwise build on their first run: the shared
+# frames (and their on-disk snapshots), the rollup cube, the world and
+# ranking indexes, then imports the chart libraries. Run it as part of
+# starting the server,
+#
+#     python warmup.py && streamlit run app.py
+#
+# so a fresh deploy has its snapshots and result cache on disk, and app.py
+# starts it again in a background thread once per server process, so
+# the in-memory caches are filled before anyone opens the other pages.
+# Every step takes the same arguments as the pages, so they hit the same
+# cache entries; a missing data file just skips its step.
+
+CHART_BACKENDS = ("altair", "plotly.express", "plotly.graph_objects", "pydeck")
+
+logger = logging.getLogger("dashboard.warmup")
+
+
+def warm_uber():
+    version = dataset_version(datasets.UBER)
+    df = datasets.load(datasets.UBER, version)
+    get_ranking_index("uber_booking_value", version, None, df["booking_value"].to_numpy())
+    rejected_rows(datasets.UBER, version=version)
+    rollup.load_uber_rollup(datasets.UBER, version)
+
+
+def warm_world():
+    version = dataset_version(datasets.WORLD)
+    df = datasets.load(datasets.WORLD, version)
+    rejected_rows(datasets.WORLD, version=version)
+    lat, lng = df["lat"].to_numpy(), df["lng"].to_numpy()
+    get_filter_index(version, df["country"].to_numpy(), df["population"].to_numpy())
+    get_cluster_index(version, lat, lng)
+    get_spatial_index(version, lat, lng)
+    get_ranking_index(
+        "world_population", version, df["country"].to_numpy(), df["population"].to_numpy(),
+        {"lat": lat, "lng": lng},
+    )
+    if query_engine.enabled():
+        query_engine.parquet_source(version, df, "world")
+
+
+def warm_adidas():
+    version = dataset_version(datasets.ADIDAS)
+    datasets.load(datasets.ADIDAS, version)
+    rejected_rows(datasets.ADIDAS, version=version)
+
+
+def import_backends():
+    for name in CHART_BACKENDS:
+        importlib.import_module(name)
+
+
+STEPS = [warm_uber, warm_world, warm_adidas, import_backends]
+
+
+def warm_up(steps=STEPS):
+    """Run each warm-up step, logging (not raising) failures."""
+    for step in steps:
+        try:
+            step()
+        except FileNotFoundError as exc:
+            logger.info("Warm-up skipped %s: %s", step.__name__, exc)
+        except Exception:
+            logger.exception("Warm-up step %s failed", step.__name__)
+
+
+@st.cache_resource(show_spinner=False)
+def start():
+    """`warm_up` in a background thread, started once per server process."""
+    thread = threading.Thread(target=warm_up, name="dashboard-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    for step in STEPS:
+        begin = time.perf_counter()
+        warm_up([step])
+        print(f"{step.__name__:16} {time.perf_counter() - begin:6.2f} s")
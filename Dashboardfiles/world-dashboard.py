@@ -1,24 +1,49 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
 
-st.set_page_config(page_title="World Dashboard", layout="wide")
-
-# --- Load & tidy ---
-df = pd.read_csv("worldnew.csv")
+from data_loader import dataset_version, rejected_rows
+import datasets
+from spatial_index import get_spatial_index
+from map_lod import get_cluster_index
+from filter_index import get_filter_index
+from ranking_index import get_ranking_index
+from geo_bins import cached_grid_bins, cached_hex_bins, heatmap_cell_deg
+import profiling
+import query_engine
+import result_cache
+from paged_table import paged_table
+from panels import Panels
 
-# If CSV has an extra index col
-if "Unnamed: 0" in df.columns:
-    df = df.drop(columns=["Unnamed: 0"])
+st.set_page_config(page_title="World Dashboard", layout="wide")
 
-# Ensure numeric coords and drop bad rows
-df["lat"] = pd.to_numeric(df["lat"], errors="coerce")
-df["lng"] = pd.to_numeric(df["lng"], errors="coerce")
-df["population"] = pd.to_numeric(df["population"], errors="coerce")
-df = df.dropna(subset=["lat", "lng", "population"])
+profiling.start_run()
+
+with profiling.section("load") as span:
+    # Version published by the background refresher; also the cache key for
+    # the per-dataset indexes below
+    version = dataset_version(datasets.WORLD)
+    # One read-only, tidied frame per process; sessions only take views of it
+    df = datasets.load(datasets.WORLD, version)
+    rejected = rejected_rows(datasets.WORLD, version=version)
+
+    # Country codes + population order, built once per file version
+    filters = get_filter_index(version, df["country"].to_numpy(), df["population"].to_numpy())
+    # Cities sorted by population within each country, with running sums of
+    # population / lat / lng: the rankings below read it instead of sorting
+    ranking = get_ranking_index(
+        "world_population", version, df["country"].to_numpy(), df["population"].to_numpy(),
+        {"lat": df["lat"].to_numpy(), "lng": df["lng"].to_numpy()},
+    )
+    # With DASHBOARD_BACKEND=duckdb the filter and country aggregates below
+    # run as SQL over a Parquet snapshot of this frame
+    sql_source = query_engine.parquet_source(version, df, "world") if query_engine.enabled() else None
+    span.set(rows_out=len(df))
+if len(rejected):
+    with st.expander(f"{len(rejected):,} values rejected while loading worldnew.csv"):
+        st.dataframe(rejected, hide_index=True)
 
 # --- Header KPIs ---
-with st.container(border=True):
+with st.container(border=True), profiling.section("kpis", rows_in=len(df)):
     col1, col2, col3, col4, col5 = st.columns(5)
     col1.metric("Total Cities (unique)", int(df["city"].nunique()))
     col2.metric("Total Countries", int(df["country"].nunique()))
@@ -30,13 +55,12 @@ with st.container(border=True):
 with st.sidebar:
     st.header("Filters")
 
-    countries_all = sorted(df["country"].dropna().unique().tolist())
+    countries_all = filters.categories
     selected_countries = st.multiselect(
         "Country", options=countries_all, default=countries_all
     )
 
-    min_pop = int(df["population"].min()) if df["population"].notna().any() else 0
-    max_pop = int(df["population"].max()) if df["population"].notna().any() else 0
+    min_pop, max_pop = (int(v) for v in filters.value_range)
 
     pop_lo, pop_hi = st.slider(
         "Population range",
@@ -52,8 +76,133 @@ with st.sidebar:
     )
 
 # --- Apply filters ---
-mask = df["country"].isin(selected_countries) & df["population"].between(pop_lo, pop_hi)
-df_f = df.loc[mask].copy()
+PANEL_COLUMNS = ["city", "lat", "lng", "population"]
+
+with profiling.section("filter", rows_in=len(df)) as span:
+    if sql_source:
+        rows = query_engine.world_rows(sql_source, selected_countries, pop_lo, pop_hi)
+    else:
+        rows = filters.select(selected_countries, pop_lo, pop_hi)
+    mask = filters.mask(rows)
+    # Only the columns the panels below read, as numpy takes, rather than a
+    # copy of every column of the filtered rows
+    df_f = pd.DataFrame(
+        {col: df[col].to_numpy()[rows] for col in PANEL_COLUMNS},
+        index=df.index[rows], copy=False,
+    )
+    span.set(rows_out=len(rows))
+
+# --- Panels ---
+# The maps, charts and tables below each do their own aggregation and
+# layer building; all of it is prepared here on the panel thread pool
+# while the page renders (see panels.py).
+import pydeck as pdk
+
+# Fragment slider defaults; their current values (kept in session state
+# under the widget keys) let the full run prepare those maps ahead
+HEAT_RADIUS_PX, HEAT_INTENSITY = 40, 4
+HEX_ELEVATION, HEX_RADIUS_M = 10, 50000
+
+
+def country_centroids(countries, lo, hi):
+    if sql_source:
+        return query_engine.world_centroids(sql_source, countries, lo, hi)
+    # Means from the ranking index's running sums, no pass over the rows
+    centroid = ranking.top_groups(10, countries, lo, hi, by="mean")
+    return centroid.rename(columns={"group": "country", "value": "population"})[
+        ["country", "population", "lat", "lng"]
+    ]
+
+
+@st.cache_data(max_entries=64)
+@result_cache.persistent()
+def top_countries(version, countries, lo, hi, _ranking, _sql_source=None):
+    # Per filter state, in memory and in the on-disk result cache
+    if _sql_source:
+        return query_engine.world_top_countries(_sql_source, countries, lo, hi)
+    top = _ranking.top_groups(10, countries, lo, hi)
+    return top.rename(columns={"group": "country", "value": "population"})[["country", "population"]]
+
+
+def heatmap_deck(df_f, radius_px, intensity):
+    view = pdk.ViewState(
+        latitude=float(df_f["lat"].mean()),
+        longitude=float(df_f["lng"].mean()),
+        zoom=2, pitch=0
+    )
+
+    # Bin cities into grid cells well below the kernel size, so the browser
+    # gets one weighted point per cell instead of every city
+    heat_cells = cached_grid_bins(
+        df_f["lat"].to_numpy(), df_f["lng"].to_numpy(), df_f["population"].to_numpy(),
+        heatmap_cell_deg(radius_px, view.zoom),
+    )
+
+    heat = pdk.Layer(
+        "HeatmapLayer",
+        data=heat_cells,
+        get_position='[lng, lat]',
+        get_weight="weight",     # summed population, heavier cells glow more
+        radiusPixels=radius_px,
+        intensity=intensity,
+    )
+
+    return pdk.Deck(layers=[heat], initial_view_state=view)
+
+
+def hexagon_deck(df_f, elev, radius_m):
+    view = pdk.ViewState(
+        latitude=float(df_f["lat"].mean()),
+        longitude=float(df_f["lng"].mean()),
+        zoom=2.2, pitch=40, bearing=15
+    )
+
+    # Hexagons are aggregated here; the layer only draws one column per cell
+    hex_cells = cached_hex_bins(
+        df_f["lat"].to_numpy(), df_f["lng"].to_numpy(), df_f["population"].to_numpy(),
+        radius_m, view.latitude,
+    )
+
+    hex_layer = pdk.Layer(
+        "ColumnLayer",
+        data=hex_cells,
+        get_position='[lng, lat]',
+        radius=radius_m,
+        disk_resolution=6,
+        elevation_scale=elev,
+        get_elevation="elevation",
+        get_fill_color="color",
+        extruded=True,
+        coverage=0.9,
+        pickable=True,
+    )
+
+    return pdk.Deck(
+        layers=[hex_layer], initial_view_state=view,
+        tooltip={"text": "Cells aggregated by nearby cities\nHeight ~ density\n{count} cities, pop {weight}"},
+    )
+
+
+def city_options(df_f):
+    return sorted(df_f["city"].unique())
+
+
+# Cluster hierarchy over every city, built once per file version; each map
+# gets at most a few thousand representative points sized by city count
+cluster_index = get_cluster_index(version, df["lat"].to_numpy(), df["lng"].to_numpy())
+
+panels = Panels()
+panels.add("city_points", cluster_index.clusters, rows)
+if show_top10 and len(df_f):
+    panels.add("centroids", country_centroids, selected_countries, pop_lo, pop_hi)
+panels.add("top10", top_countries, version, tuple(selected_countries), pop_lo, pop_hi, ranking, sql_source)
+panels.add("heatmap", heatmap_deck, df_f,
+           st.session_state.get("heat_radius", HEAT_RADIUS_PX),
+           st.session_state.get("heat_intensity", HEAT_INTENSITY))
+panels.add("hexagons", hexagon_deck, df_f,
+           st.session_state.get("hex_elevation", HEX_ELEVATION),
+           st.session_state.get("hex_radius", HEX_RADIUS_M))
+panels.add("city_options", city_options, df_f)
 
 st.subheader("Cities")
 st.caption("Dots show cities that match your filters.")
@@ -66,30 +215,26 @@ centroid = pd.DataFrame(columns=["country", "population", "lat", "lng"])
 if show_top10:
     st.subheader("Top 10 Countries (by average city population)")
     if len(df_f):
-        centroid = (
-            df_f.groupby("country", as_index=False)
-                .agg(
-                    population=("population", "mean"),
-                    lat=("lat", "mean"),
-                    lng=("lng", "mean"),
-                )
-                .sort_values("population", ascending=False)
-                .head(10)
-        )
+        with profiling.section("centroids", rows_in=len(df_f)) as span:
+            centroid = panels.result("centroids")
+            span.set(rows_out=len(centroid), prepare_ms=panels.prepare_ms("centroids"))
 
    
 # --- Tabs (use the safely-defined `centroid`) ---
 tab1, tab2 = st.tabs(["Cities", "Country Centroids"])
-with tab1:
-    st.map(df_f, latitude="lat", longitude="lng")
+with tab1, profiling.section("cities_map", rows_in=len(rows)) as span:
+    city_points = panels.result("city_points")
+    span.set(rows_out=len(city_points), payload=city_points, prepare_ms=panels.prepare_ms("city_points"))
+    st.map(city_points, latitude="lat", longitude="lng", size="size")
 with tab2:
     if not centroid.empty:
         st.map(centroid, latitude="lat", longitude="lng")
 
-        st.dataframe(
+        paged_table(
             centroid.rename(columns={"population": "avg_city_population"})[
                 ["country", "avg_city_population", "lat", "lng"]
             ],
+            key="centroids",
             use_container_width=True,
         )
 
@@ -98,13 +243,11 @@ with tab2:
 
 
 
-top10 = (
-    df_f.groupby("country")["population"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(10)
-        .reset_index()
-)
+with profiling.section("top10_countries", rows_in=len(df_f)) as span:
+    top10 = panels.result("top10")
+    span.set(rows_out=len(top10), payload=top10, prepare_ms=panels.prepare_ms("top10"))
+
+import altair as alt   # loaded once the page has something on screen
 
 chart = (
     alt.Chart(top10)
@@ -127,148 +270,137 @@ st.altair_chart(chart, use_container_width=True)
 
 
 
-import pydeck as pdk
+# Each map section below is a fragment: moving one of its widgets reruns only
+# that section with the data captured at the last full run, instead of the
+# whole page. Sidebar filters still rerun everything.
 
-st.subheader("City Density Heatmap")
+@st.fragment
+@profiling.profiled("heatmap")
+def heatmap_section(df_f):
+    st.subheader("City Density Heatmap")
 
-# Controls
-c1, c2 = st.columns(2)
-radius_px = c1.slider("Point radius (pixels)", 10, 100, 40)
-intensity = c2.slider("Intensity", 1, 10, 4)
+    # Controls
+    c1, c2 = st.columns(2)
+    radius_px = c1.slider("Point radius (pixels)", 10, 100, HEAT_RADIUS_PX, key="heat_radius")
+    intensity = c2.slider("Intensity", 1, 10, HEAT_INTENSITY, key="heat_intensity")
 
-view = pdk.ViewState(
-    latitude=float(df_f["lat"].mean()),
-    longitude=float(df_f["lng"].mean()),
-    zoom=2, pitch=0
-)
+    # Prepared with the rest of the page unless a slider just moved
+    st.pydeck_chart(panels.get("heatmap", heatmap_deck, df_f, radius_px, intensity))
 
-heat = pdk.Layer(
-    "HeatmapLayer",
-    data=df_f,
-    get_position='[lng, lat]',
-    get_weight="population",     # heavier cities glow more
-    radiusPixels=radius_px,
-    intensity=intensity,
-)
 
-r = pdk.Deck(layers=[heat], initial_view_state=view, tooltip={"text": "{city}, {country}\nPop: {population}"})
-st.pydeck_chart(r)
+heatmap_section(df_f)
 
 
-import pydeck as pdk
+@st.fragment
+@profiling.profiled("hexagons")
+def hexagon_section(df_f):
+    st.subheader("Hexagon Density (3D)")
 
-st.subheader("Hexagon Density (3D)")
+    elev = st.slider("Elevation scale", 1, 50, HEX_ELEVATION, key="hex_elevation")
+    radius_m = st.slider("Hexagon radius (meters)", 10000, 150000, HEX_RADIUS_M, step=5000,
+                         key="hex_radius")
 
-elev = st.slider("Elevation scale", 1, 50, 10)
-radius_m = st.slider("Hexagon radius (meters)", 10000, 150000, 50000, step=5000)
+    st.pydeck_chart(panels.get("hexagons", hexagon_deck, df_f, elev, radius_m))
 
-view = pdk.ViewState(
-    latitude=float(df_f["lat"].mean()),
-    longitude=float(df_f["lng"].mean()),
-    zoom=2.2, pitch=40, bearing=15
-)
 
-hex_layer = pdk.Layer(
-    "HexagonLayer",
-    data=df_f,
-    get_position='[lng, lat]',
-    radius=radius_m,
-    elevation_scale=elev,
-    elevation_range=[0, 3000],
-    extruded=True,
-    coverage=0.9,
-    get_weight="population",
-    pickable=True,
-)
+hexagon_section(df_f)
 
-r = pdk.Deck(layers=[hex_layer], initial_view_state=view,
-             tooltip={"text": "Cells aggregated by nearby cities\nHeight ~ density"})
-st.pydeck_chart(r)
 
-import numpy as np
+@st.fragment
+@profiling.profiled("nearby")
+def nearby_section(df_f, mask):
+    st.subheader("Nearby Cities Finder")
 
-st.subheader("Nearby Cities Finder")
+    if df_f.empty:
+        st.info("No cities available with current filters.")
+        return
 
-if not df_f.empty:
     # Pick a reference city
-    home_city = st.selectbox("Select a city", sorted(df_f["city"].unique()))
+    home_city = st.selectbox("Select a city", panels.get("city_options", city_options, df_f))
     max_km = st.slider("Radius (km)", 50, 3000, 500, step=50)
 
     # Fetch the home city coords
     home_row = df_f.loc[df_f["city"] == home_city].iloc[0]
     lat0, lng0 = float(home_row["lat"]), float(home_row["lng"])
 
-    # Haversine distance (km)
-    def haversine(lat1, lon1, lat2, lon2):
-        R = 6371.0
-        p1, p2 = np.radians(lat1), np.radians(lat2)
-        dlat = np.radians(lat2 - lat1)
-        dlon = np.radians(lon2 - lon1)
-        a = np.sin(dlat/2)**2 + np.cos(p1)*np.cos(p2)*np.sin(dlon/2)**2
-        return 2*R*np.arcsin(np.sqrt(a))
-
-    df_near = df_f.copy()
-    df_near["km"] = haversine(lat0, lng0, df_near["lat"].values, df_near["lng"].values)
-    df_near = df_near[df_near["km"] <= max_km].sort_values("km")
+    # Grid index over every city (built once per file version); the sidebar
+    # filter is applied as a mask, results come back nearest first
+    city_index = get_spatial_index(version, df["lat"].to_numpy(), df["lng"].to_numpy())
+    near_rows, km = city_index.query_radius(lat0, lng0, max_km, mask=mask)
+    df_near = df.iloc[near_rows].assign(km=km)
 
     st.caption(f"Found {len(df_near)} cities within {max_km} km of {home_city}.")
-    st.map(df_near, latitude="lat", longitude="lng")
-    st.dataframe(df_near[["city","country","population","km"]].reset_index(drop=True), use_container_width=True)
-else:
-    st.info("No cities available with current filters.")
+    st.map(cluster_index.clusters(near_rows), latitude="lat", longitude="lng", size="size")
+    # Only the visible page is sent; sort / search run on the server
+    paged_table(df_near[["city","country","population","km"]].reset_index(drop=True),
+                key="nearby", use_container_width=True)
 
 
-import pydeck as pdk
+nearby_section(df_f, mask)
 
-st.subheader("Country Hub → Top Cities (Arcs)")
 
-if not df_f.empty:
-    pick_country = st.selectbox("Choose a country to highlight", sorted(df_f["country"].unique()))
-    k = st.slider("Top N cities by population", 3, 30, 10)
+@st.fragment
+@profiling.profiled("arcs")
+def arcs_section(df_f, rows):
+    st.subheader("Country Hub → Top Cities (Arcs)")
 
-    df_c = df_f[df_f["country"] == pick_country].copy()
-    if not df_c.empty:
-        # ✅ Correct way: mean lat/lng as floats
-        hub_lat = float(df_c["lat"].mean())
-        hub_lng = float(df_c["lng"].mean())
-
-        # Top N destination cities
-        top_cities = df_c.sort_values("population", ascending=False).head(k).copy()
-        top_cities["hub_lat"] = hub_lat
-        top_cities["hub_lng"] = hub_lng
-
-        arcs = pdk.Layer(
-            "ArcLayer",
-            data=top_cities,
-            get_source_position='[hub_lng, hub_lat]',
-            get_target_position='[lng, lat]',
-            get_width=2,
-            get_source_color=[10, 120, 255],
-            get_target_color=[255, 80, 0],
-            pickable=True,
-        )
-        hub_point = pdk.Layer(
-            "ScatterplotLayer",
-            data=[{"lng": hub_lng, "lat": hub_lat}],
-            get_position='[lng, lat]',
-            get_radius=60000,
-            get_fill_color=[0,0,0,200]
-        )
-        city_points = pdk.Layer(
-            "ScatterplotLayer",
-            data=top_cities,
-            get_position='[lng, lat]',
-            get_radius=30000,
-            get_fill_color=[255, 140, 0, 160],
-            pickable=True
-        )
+    if df_f.empty:
+        return
 
-        view = pdk.ViewState(latitude=hub_lat, longitude=hub_lng, zoom=3, pitch=30)
-        r = pdk.Deck(
-            layers=[hub_point, city_points, arcs],
-            initial_view_state=view,
-            tooltip={"text": "{city}, Pop: {population}"}
-        )
-        st.pydeck_chart(r)
-    else:
+    pick_country = st.selectbox("Choose a country to highlight", filters.categories_in(rows))
+    k = st.slider("Top N cities by population", 3, 30, 10)
+
+    # The country's cities under the population filter, from the ranking
+    # index: count and lat/lng sums for the hub, the first k rows for the arcs
+    hub = ranking.aggregate([pick_country], pop_lo, pop_hi)
+    if hub.empty:
         st.info("No cities for that country under current filters.")
+        return
+
+    # ✅ Correct way: mean lat/lng as floats
+    hub_lat = float(hub["lat"].iloc[0] / hub["count"].iloc[0])
+    hub_lng = float(hub["lng"].iloc[0] / hub["count"].iloc[0])
+
+    # Top N destination cities
+    top_cities = df.iloc[ranking.top(k, pick_country, pop_lo, pop_hi)].assign(
+        hub_lat=hub_lat, hub_lng=hub_lng
+    )
+
+    arcs = pdk.Layer(
+        "ArcLayer",
+        data=top_cities,
+        get_source_position='[hub_lng, hub_lat]',
+        get_target_position='[lng, lat]',
+        get_width=2,
+        get_source_color=[10, 120, 255],
+        get_target_color=[255, 80, 0],
+        pickable=True,
+    )
+    hub_point = pdk.Layer(
+        "ScatterplotLayer",
+        data=[{"lng": hub_lng, "lat": hub_lat}],
+        get_position='[lng, lat]',
+        get_radius=60000,
+        get_fill_color=[0,0,0,200]
+    )
+    city_points = pdk.Layer(
+        "ScatterplotLayer",
+        data=top_cities,
+        get_position='[lng, lat]',
+        get_radius=30000,
+        get_fill_color=[255, 140, 0, 160],
+        pickable=True
+    )
+
+    view = pdk.ViewState(latitude=hub_lat, longitude=hub_lng, zoom=3, pitch=30)
+    r = pdk.Deck(
+        layers=[hub_point, city_points, arcs],
+        initial_view_state=view,
+        tooltip={"text": "{city}, Pop: {population}"}
+    )
+    st.pydeck_chart(r)
+
+
+arcs_section(df_f, rows)
+
+profiling.debug_panel()
@@ -0,0 +1,369 @@
+"""
+Headless rerun-latency benchmarks for the dashboard scripts.
+
+Every scenario drives a script through Streamlit's AppTest (no browser, no
+server) and records, over several repeats:
+
+  - p50 / p95 wall time of the measured run
+  - peak RSS of this process while the scenario ran
+  - number of elements the script rendered
+
+Scenarios:
+  cold          every cache cleared, in memory and on disk (as after a fresh
+                deploy), first run of the script; includes parsing the files
+  first_render  a new session against warm caches
+  <widget>      one scripted interaction on an already-rendered session
+
+With --cold-start each script instead runs in fresh Python processes (the
+on-disk snapshots already built, nothing imported or cached in memory) and
+the report has, per script:
+
+  import_ms       importing Streamlit itself
+  first_paint_ms  start of the run until its first element is sent
+  first_run_ms    start of the run until the whole page is sent
+  backends        chart libraries the run imported
+
+The scripts read their data files relative to the working directory, so
+point --data-dir at the folder holding newuber.csv, worldnew.csv and
+Data/Adidas.xlsx. The on-disk snapshot and result caches are kept in a
+temporary folder for the length of the benchmark, so the app's own
+.data_cache is neither read nor wiped.
+
+Usage:
+    python benchmarks/bench_dashboards.py --data-dir ~/data --out before.json
+    python benchmarks/bench_dashboards.py --data-dir ~/data --out after.json --compare before.json
+    python benchmarks/bench_dashboards.py --data-dir ~/data --cold-start --scripts app.py dashboard.py
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(REPO, "Dashboardfiles")
+
+
+#############################
+# Measurement helpers
+#############################
+
+class PeakRSS:
+    """Sample this process's resident set size in a background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # No procfs (macOS): lifetime peak is the best we have
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def count_elements(node):
+    """Rendered elements below an AppTest tree node (containers excluded)."""
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return sum(count_elements(child) for child in children.values())
+
+
+def clear_caches():
+    """Drop everything a restarted worker on a fresh deploy wouldn't have."""
+    import streamlit as st
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    # On-disk snapshots and stored results (see main: a temporary folder)
+    shutil.rmtree(os.environ["DASHBOARD_CACHE_DIR"], ignore_errors=True)
+    # Module-level memos kept next to those caches
+    if "result_cache" in sys.modules:
+        sys.modules["result_cache"]._fingerprints.clear()
+    if "ranking_index" in sys.modules:
+        sys.modules["ranking_index"]._latest.clear()
+
+
+def new_app(script, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(os.path.join(APP_DIR, script), default_timeout=timeout)
+
+
+def check(at, script, scenario):
+    if at.exception:
+        raise RuntimeError(f"{script} / {scenario} raised: {at.exception[0].value}")
+
+
+#############################
+# Scenarios
+#############################
+
+def _pick(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"no widget labelled {label!r}")
+
+
+def _toggle_slider(label, first, second):
+    def interact(at, i):
+        _pick(at.slider, label).set_value(first if i % 2 == 0 else second)
+    return interact
+
+
+def _toggle_selectbox(label):
+    def interact(at, i):
+        box = _pick(at.selectbox, label)
+        box.set_value(box.options[(i + 1) % len(box.options)])
+    return interact
+
+
+def _country_subset(at, i):
+    box = at.sidebar.multiselect[0]
+    # Alternate between a handful of countries and all of them
+    box.set_value(box.options[:5] if i % 2 == 0 else box.options)
+
+
+def _population_range(at, i):
+    slider = at.sidebar.slider[0]
+    lo, hi = slider.min, slider.max
+    slider.set_range(lo, lo + (hi - lo) // (4 if i % 2 == 0 else 2))
+
+
+# script -> {scenario name: interaction(at, repeat index)}
+INTERACTIONS = {
+    "app.py": {},   # multipage entry, renders the default page
+    "dashboard.py": {
+        "bins_slider": _toggle_slider("Bins for booking value", 60, 20),
+        "chart_type": _toggle_selectbox("Chart type"),
+    },
+    "world-dashboard.py": {
+        "country_multiselect": _country_subset,
+        "population_slider": _population_range,
+        "nearby_radius": _toggle_slider("Radius (km)", 1500, 300),
+    },
+    "chart_elements.py": {},
+    "data_elements.py": {},
+    "widgets.py": {},
+}
+
+
+def summarize(samples, rss, elements):
+    samples = np.asarray(samples) * 1000
+    return {
+        "runs": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 2),
+        "p95_ms": round(float(np.percentile(samples, 95)), 2),
+        "peak_rss_mb": round(rss / 2 ** 20, 1),
+        "elements": elements,
+    }
+
+
+def bench_script(script, repeats, timeout):
+    results = {}
+
+    samples = []
+    with PeakRSS() as rss:
+        for _ in range(repeats):
+            clear_caches()
+            at = new_app(script, timeout)
+            start = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - start)
+            check(at, script, "cold")
+    results["cold"] = summarize(samples, rss.peak, count_elements(at.main))
+
+    samples = []
+    with PeakRSS() as rss:
+        for _ in range(repeats):
+            at = new_app(script, timeout)
+            start = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - start)
+            check(at, script, "first_render")
+    results["first_render"] = summarize(samples, rss.peak, count_elements(at.main))
+
+    for name, interact in INTERACTIONS[script].items():
+        at = new_app(script, timeout).run()
+        samples = []
+        with PeakRSS() as rss:
+            for i in range(repeats):
+                interact(at, i)
+                start = time.perf_counter()
+                at.run()
+                samples.append(time.perf_counter() - start)
+                check(at, script, name)
+        results[name] = summarize(samples, rss.peak, count_elements(at.main))
+    return results
+
+
+#############################
+# Cold start
+#############################
+
+BACKENDS = ("altair", "plotly.express", "plotly.graph_objects", "plotly.figure_factory", "pydeck")
+
+# Runs in a fresh interpreter; prints one JSON line
+COLD_START_CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+from streamlit.testing.v1 import AppTest
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+imported = time.perf_counter()
+
+first_paint = []
+enqueue = ForwardMsgQueue.enqueue
+
+def timed_enqueue(self, msg):
+    if not first_paint and msg.HasField("delta") and msg.delta.HasField("new_element"):
+        first_paint.append(time.perf_counter())
+    enqueue(self, msg)
+
+ForwardMsgQueue.enqueue = timed_enqueue
+at = AppTest.from_file({script!r}, default_timeout={timeout})
+run_start = time.perf_counter()
+at.run()
+done = time.perf_counter()
+print(json.dumps({{
+    "error": str(at.exception[0].value) if at.exception else None,
+    "import_ms": (imported - start) * 1000,
+    "first_paint_ms": ((first_paint or [done])[0] - run_start) * 1000,
+    "first_run_ms": (done - run_start) * 1000,
+    "backends": sorted(m for m in {backends!r} if m in sys.modules),
+}}))
+sys.stdout.flush()
+# Don't wait for (or tear down) background threads the app started
+os._exit(0)
+"""
+
+
+def cold_start(script, repeats, timeout):
+    code = COLD_START_CHILD.format(
+        app_dir=APP_DIR, script=os.path.join(APP_DIR, script), timeout=timeout, backends=BACKENDS,
+    )
+    runs = []
+    # The first process builds any missing on-disk snapshots and isn't counted
+    for i in range(repeats + 1):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+        if run["error"]:
+            raise RuntimeError(f"{script} / cold_start raised: {run['error']}")
+        if i:
+            runs.append(run)
+
+    def p50(name):
+        return round(float(np.percentile([run[name] for run in runs], 50)), 2)
+
+    return {
+        "runs": len(runs),
+        "import_ms": p50("import_ms"),
+        "first_paint_ms": p50("first_paint_ms"),
+        "p50_ms": p50("first_run_ms"),
+        "backends": runs[-1]["backends"],
+    }
+
+
+#############################
+# CLI
+#############################
+
+def compare(current, baseline):
+    print(f"\n{'script / scenario':48} {'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for script, scenarios in current["results"].items():
+        for name, stats in scenarios.items():
+            before = baseline.get("results", {}).get(script, {}).get(name)
+            if not before:
+                continue
+            # Cold-start results also compare their time to first paint
+            for metric, label in (("p50_ms", name), ("first_paint_ms", name + " first paint")):
+                if metric not in stats or metric not in before:
+                    continue
+                change = (stats[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                print(f"{script + ' / ' + label:48} {before[metric]:>11.1f} {stats[metric]:>10.1f} {change:>+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dashboard reruns with AppTest.")
+    parser.add_argument("--data-dir", default=".", help="folder the dashboards read their files from")
+    parser.add_argument("--scripts", nargs="*", default=list(INTERACTIONS), help="scripts to run")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120, help="per-run AppTest timeout (s)")
+    parser.add_argument("--out", help="write results as JSON here")
+    parser.add_argument("--compare", help="earlier JSON results to diff against")
+    parser.add_argument("--cold-start", action="store_true",
+                        help="time first runs in fresh processes instead (see above)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, APP_DIR)
+    os.chdir(os.path.expanduser(args.data_dir))
+    # Read by the app modules (and cold-start children) when they load
+    cache_dir = tempfile.mkdtemp(prefix="dashboard-bench-")
+    os.environ["DASHBOARD_CACHE_DIR"] = cache_dir
+    os.environ.pop("DASHBOARD_RESULT_CACHE_DIR", None)
+
+    import streamlit
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "repeats": args.repeats,
+        "results": {},
+    }
+    for script in args.scripts:
+        if args.cold_start:
+            stats = cold_start(script, args.repeats, args.timeout)
+            report["results"][script] = {"cold_start": stats}
+            print(f"{script:20} cold_start  import {stats['import_ms']:8.1f} ms  first paint "
+                  f"{stats['first_paint_ms']:8.1f} ms  first run {stats['p50_ms']:8.1f} ms  "
+                  f"backends {', '.join(stats['backends']) or '-'}")
+            continue
+        report["results"][script] = bench_script(script, args.repeats, args.timeout)
+        for name, stats in report["results"][script].items():
+            print(f"{script:20} {name:20} p50 {stats['p50_ms']:9.1f} ms  p95 {stats['p95_ms']:9.1f} ms  "
+                  f"rss {stats['peak_rss_mb']:7.1f} MB  elements {stats['elements']}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Seeded synthetic datasets shaped like the files the dashboards read.
+
+Schemas:
+  uber      newuber.csv (cleaned bookings, as written by uber.ipynb)
+  uber-raw  ncr_ride_bookings.csv (raw bookings, with the usual nulls)
+  world     worldnew.csv (cities)
+  adidas    Adidas.xlsx (invoices)
+
+Rows are produced and written chunk by chunk, so 100M rows need no more
+memory than one chunk. Category mixes, skew (Zipf-like customers and
+countries, log-normal prices and populations) and date ranges follow the
+real files. The same seed and chunk size always give the same data.
+
+Usage:
+    python synthetic_data.py uber --rows 10_000_000 --out newuber.csv
+    python synthetic_data.py world --rows 1_000_000 --out worldnew.parquet
+    python synthetic_data.py adidas --rows 500_000 --out Data/Adidas.xlsx
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 500_000
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def _choice(rng, values, weights, n):
+    weights = np.asarray(weights, dtype="float64")
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=weights / weights.sum())]
+
+
+def _zipf_ids(rng, n, population, a=1.3):
+    # Heavy repeat users / big countries: rank ~ Zipf, folded into the id range
+    return (rng.zipf(a, n) - 1) % population
+
+
+#############################
+# Uber bookings
+#############################
+
+VEHICLE_TYPES = ["Auto", "Go Mini", "Go Sedan", "Bike", "Premier Sedan", "eBike", "Uber XL"]
+VEHICLE_WEIGHTS = [25, 20, 18, 15, 12, 7, 3]
+
+BOOKING_STATUSES = ["Completed", "Cancelled by Driver", "No Driver Found", "Cancelled by Customer", "Incomplete"]
+STATUS_WEIGHTS = [62, 18, 7, 7, 6]
+
+PAYMENT_METHODS = ["UPI", "Cash", "Uber Wallet", "Credit Card", "Debit Card"]
+PAYMENT_WEIGHTS = [45, 25, 12, 10, 8]
+
+CUSTOMER_REASONS = [
+    "Wrong Address", "Change of plans", "Driver is not moving towards pickup location",
+    "Driver asked to cancel", "AC is not working",
+]
+DRIVER_REASONS = [
+    "Customer related issue", "The customer was coughing/sick",
+    "Personal & Car related issues", "More than permitted people in there",
+]
+INCOMPLETE_REASONS = ["Customer Demand", "Vehicle Breakdown", "Other Issue"]
+
+LOCATIONS = [
+    "Palam Vihar", "Shastri Nagar", "Khandsa", "Central Secretariat", "Ghitorni Village",
+    "AIIMS", "Vaishali", "Mayur Vihar", "Noida Sector 62", "Rohini", "Saket", "Dwarka Mor",
+    "Cyber Hub", "Gurgaon Sector 56", "Karol Bagh", "Lajpat Nagar", "Janakpuri",
+    "Nehru Place", "Indirapuram", "Kashmere Gate",
+] + [f"Sector {i}" for i in range(1, 157)]
+LOCATIONS_ARR = np.asarray(LOCATIONS, dtype=object)
+
+# Approximate whole-file means / modes, so every chunk fills identically
+UBER_MEANS = {
+    "avg_vtat": 8.4, "avg_ctat": 29.1, "cancelled_rides_by_customer": 1.0,
+    "cancelled_rides_by_driver": 1.0, "incomplete_rides": 1.0, "booking_value": 508.0,
+    "ride_distance": 24.6, "driver_ratings": 4.23, "customer_rating": 4.4,
+}
+UBER_MODES = {
+    "reason_for_cancelling_by_customer": CUSTOMER_REASONS[0],
+    "driver_cancellation_reason": DRIVER_REASONS[0],
+    "incomplete_rides_reason": INCOMPLETE_REASONS[0],
+    "payment_method": PAYMENT_METHODS[0],
+}
+
+UBER_START = pd.Timestamp("2024-01-01")
+UBER_DAYS = 366
+
+RAW_UBER_NAMES = {
+    "date": "Date", "time": "Time", "booking_id": "Booking ID", "booking_status": "Booking Status",
+    "customer_id": "Customer ID", "vehicle_type": "Vehicle Type", "pickup_location": "Pickup Location",
+    "drop_location": "Drop Location", "avg_vtat": "Avg VTAT", "avg_ctat": "Avg CTAT",
+    "cancelled_rides_by_customer": "Cancelled Rides by Customer",
+    "reason_for_cancelling_by_customer": "Reason for cancelling by Customer",
+    "cancelled_rides_by_driver": "Cancelled Rides by Driver",
+    "driver_cancellation_reason": "Driver Cancellation Reason", "incomplete_rides": "Incomplete Rides",
+    "incomplete_rides_reason": "Incomplete Rides Reason", "booking_value": "Booking Value",
+    "ride_distance": "Ride Distance", "driver_ratings": "Driver Ratings", "customer_rating": "Customer Rating",
+    "payment_method": "Payment Method",
+}
+
+
+def uber_chunk(rng, start, n, total, raw=False):
+    """Bookings `start`..`start + n`; `raw` keeps the nulls of the source file."""
+    status = _choice(rng, BOOKING_STATUSES, STATUS_WEIGHTS, n)
+    completed = status == "Completed"
+    by_customer = status == "Cancelled by Customer"
+    by_driver = status == "Cancelled by Driver"
+    incomplete = status == "Incomplete"
+    no_driver = status == "No Driver Found"
+
+    # Weekly seasonality: more rides on Fri/Sat
+    day = rng.integers(0, UBER_DAYS, n)
+    busy = np.isin((UBER_START.dayofweek + day) % 7, [4, 5])
+    day = np.where(busy & (rng.random(n) < 0.15), (day + 1) % UBER_DAYS, day)
+    date = UBER_START + pd.to_timedelta(day, unit="D")
+    seconds = np.clip(rng.normal(15 * 3600, 4.5 * 3600, n), 0, 86399).astype("int64")
+
+    rides = completed | incomplete
+    frame = pd.DataFrame({
+        "date": date.strftime("%Y-%m-%d"),
+        "time": pd.to_datetime(seconds, unit="s").strftime("%H:%M:%S"),
+        "booking_id": [f'"CNR{i:08d}"' for i in range(start, start + n)],
+        "booking_status": status,
+        "customer_id": [f'"CID{i:08d}"' for i in _zipf_ids(rng, n, max(total // 2, 1))],
+        "vehicle_type": _choice(rng, VEHICLE_TYPES, VEHICLE_WEIGHTS, n),
+        "pickup_location": LOCATIONS_ARR[_zipf_ids(rng, n, len(LOCATIONS), 1.05)],
+        "drop_location": LOCATIONS_ARR[_zipf_ids(rng, n, len(LOCATIONS), 1.05)],
+        "avg_vtat": np.where(no_driver, np.nan, np.round(rng.gamma(4.0, 2.1, n), 1)),
+        "avg_ctat": np.where(rides, np.round(rng.gamma(9.0, 3.3, n), 1), np.nan),
+        "cancelled_rides_by_customer": np.where(by_customer, 1.0, np.nan),
+        "reason_for_cancelling_by_customer": np.where(by_customer, _choice(rng, CUSTOMER_REASONS, [22, 22, 22, 22, 12], n), None),
+        "cancelled_rides_by_driver": np.where(by_driver, 1.0, np.nan),
+        "driver_cancellation_reason": np.where(by_driver, _choice(rng, DRIVER_REASONS, [25, 25, 25, 25], n), None),
+        "incomplete_rides": np.where(incomplete, 1.0, np.nan),
+        "incomplete_rides_reason": np.where(incomplete, _choice(rng, INCOMPLETE_REASONS, [34, 33, 33], n), None),
+        "booking_value": np.where(rides, np.round(rng.lognormal(5.9, 0.75, n)), np.nan),
+        "ride_distance": np.where(rides, np.round(rng.uniform(1, 50, n), 2), np.nan),
+        "driver_ratings": np.where(completed, np.round(np.clip(rng.normal(4.23, 0.43, n), 3, 5), 1), np.nan),
+        "customer_rating": np.where(completed, np.round(np.clip(rng.normal(4.4, 0.44, n), 3, 5), 1), np.nan),
+        "payment_method": np.where(rides, _choice(rng, PAYMENT_METHODS, PAYMENT_WEIGHTS, n), None),
+    })
+
+    if raw:
+        return frame.rename(columns=RAW_UBER_NAMES)
+
+    # Cleaned file: same fills as uber.ipynb (means / modes), plus date parts
+    numeric = frame.select_dtypes("number").columns
+    frame[numeric] = frame[numeric].fillna(UBER_MEANS)
+    text = frame.columns.difference(numeric)
+    frame[text] = frame[text].fillna(UBER_MODES)
+    frame["year"] = date.year
+    frame["month"] = date.month
+    frame["day"] = date.day
+    return frame
+
+
+#############################
+# World cities
+#############################
+
+N_COUNTRIES = 240
+
+
+def _countries(seed):
+    # Fixed per seed so every chunk shares the same countries and centers
+    rng = np.random.default_rng([seed, 999_999])
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    codes = ["".join(rng.choice(letters, 3)) for _ in range(N_COUNTRIES)]
+    return pd.DataFrame({
+        "country": [f"Country {c.title()}" for c in codes],
+        "iso2": [c[:2] for c in codes],
+        "iso3": codes,
+        "lat": np.degrees(np.arcsin(rng.uniform(-0.8, 0.95, N_COUNTRIES))),
+        "lng": rng.uniform(-180, 180, N_COUNTRIES),
+        "spread": rng.uniform(1.5, 12.0, N_COUNTRIES),
+        "admins": rng.integers(3, 60, N_COUNTRIES),
+    })
+
+
+def world_chunk(rng, start, n, total, seed=0):
+    countries = _countries(seed)
+    c = _zipf_ids(rng, n, N_COUNTRIES, 1.15)
+    picked = countries.iloc[c].reset_index(drop=True)
+
+    lat = np.clip(picked["lat"] + rng.normal(0, 1, n) * picked["spread"] / 2, -89.9, 89.9)
+    lng = (picked["lng"] + rng.normal(0, 1, n) * picked["spread"] + 180) % 360 - 180
+    admin = (rng.zipf(1.4, n) - 1) % picked["admins"].to_numpy()
+    names = [f"City {i:x}" for i in range(start, start + n)]
+    capital = _choice(rng, ["minor", "admin", "primary", ""], [62, 30, 1, 7], n)
+
+    return pd.DataFrame({
+        "city": names,
+        "city_ascii": names,
+        "lat": np.round(lat, 4),
+        "lng": np.round(lng, 4),
+        "country": picked["country"],
+        "iso2": picked["iso2"],
+        "iso3": picked["iso3"],
+        "admin_name": [f"{iso} Province {a}" for iso, a in zip(picked["iso3"], admin)],
+        "capital": capital,
+        "population": np.round(np.minimum(rng.lognormal(9.3, 1.6, n), 4e7)),
+        "id": np.arange(start, start + n) + 1_000_000_000,
+    })
+
+
+#############################
+# Adidas invoices
+#############################
+
+RETAILERS = {"Foot Locker": 1185732, "West Gear": 1128299, "Sports Direct": 1197831,
+             "Kohl's": 1189833, "Amazon": 1185732, "Walmart": 1128299}
+RETAILER_WEIGHTS = [27, 25, 21, 11, 10, 6]
+PRODUCTS = ["Men's Street Footwear", "Men's Athletic Footwear", "Women's Apparel",
+            "Women's Street Footwear", "Women's Athletic Footwear", "Men's Apparel"]
+PRODUCT_PRICE = [44.2, 43.5, 51.6, 40.3, 41.1, 50.3]
+SALES_METHODS = ["Online", "Outlet", "In-store"]
+SALES_METHOD_WEIGHTS = [48, 34, 18]
+SALES_METHOD_MARGIN = [0.46, 0.39, 0.36]
+REGIONS = {
+    "Northeast": ["New York", "Pennsylvania", "Massachusetts", "New Jersey", "Connecticut",
+                  "Maine", "New Hampshire", "Vermont", "Rhode Island", "Delaware", "Maryland"],
+    "South": ["Texas", "Florida", "Georgia", "North Carolina", "Tennessee", "Virginia", "Alabama",
+              "South Carolina", "Louisiana", "Kentucky", "Arkansas", "Mississippi", "Oklahoma", "West Virginia"],
+    "West": ["California", "Washington", "Oregon", "Nevada", "Arizona", "Colorado", "Utah",
+             "Idaho", "Montana", "Wyoming", "New Mexico", "Alaska", "Hawaii"],
+    "Midwest": ["Illinois", "Ohio", "Michigan", "Indiana", "Wisconsin", "Minnesota", "Missouri",
+                "Iowa", "Kansas", "Nebraska", "North Dakota", "South Dakota"],
+}
+STATES = [(region, state) for region, states in REGIONS.items() for state in states]
+ADIDAS_START = pd.Timestamp("2020-01-01")
+ADIDAS_DAYS = 731
+
+
+def adidas_chunk(rng, start, n, total):
+    retailer = _choice(rng, list(RETAILERS), RETAILER_WEIGHTS, n)
+    product_i = rng.integers(0, len(PRODUCTS), n)
+    method_i = rng.choice(len(SALES_METHODS), n, p=np.array(SALES_METHOD_WEIGHTS) / 100)
+    state_i = _zipf_ids(rng, n, len(STATES), 1.1)
+
+    # Sales ramp up through 2021, as in the real file
+    day = np.floor(ADIDAS_DAYS * np.sqrt(rng.random(n))).astype("int64")
+    price = np.round(np.clip(np.asarray(PRODUCT_PRICE)[product_i] + rng.normal(0, 14, n), 7, 110))
+    units = np.clip(np.round(rng.gamma(2.0, 120, n)), 0, 1275).astype("int64")
+    margin = np.round(np.clip(np.asarray(SALES_METHOD_MARGIN)[method_i] + rng.normal(0, 0.09, n), 0.1, 0.8), 2)
+    total_sales = price * units
+
+    return pd.DataFrame({
+        "Retailer": retailer,
+        "RetailerID": [RETAILERS[r] for r in retailer],
+        "InvoiceDate": ADIDAS_START + pd.to_timedelta(day, unit="D"),
+        "Region": [STATES[i][0] for i in state_i],
+        "State": [STATES[i][1] for i in state_i],
+        "City": [STATES[i][1] if i % 3 else f"{STATES[i][1]} City" for i in state_i],
+        "Product": np.asarray(PRODUCTS, dtype=object)[product_i],
+        "PriceperUnit": price,
+        "UnitsSold": units,
+        "TotalSales": total_sales,
+        "OperatingProfit": np.round(total_sales * margin, 2),
+        "OperatingMargin": margin,
+        "SalesMethod": np.asarray(SALES_METHODS, dtype=object)[method_i],
+    })
+
+
+#############################
+# Writing
+#############################
+
+SCHEMAS = {
+    # name: (chunk function, csv index like the notebook exports)
+    "uber": (lambda rng, s, n, t, seed: uber_chunk(rng, s, n, t), True),
+    "uber-raw": (lambda rng, s, n, t, seed: uber_chunk(rng, s, n, t, raw=True), False),
+    "world": (lambda rng, s, n, t, seed: world_chunk(rng, s, n, t, seed), True),
+    "adidas": (lambda rng, s, n, t, seed: adidas_chunk(rng, s, n, t), False),
+}
+
+
+def generate(schema, rows, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield the dataset as consecutive DataFrame chunks (global RangeIndex)."""
+    make, _ = SCHEMAS[schema]
+    for i, start in enumerate(range(0, rows, chunksize)):
+        n = min(chunksize, rows - start)
+        rng = np.random.default_rng([seed, i])
+        chunk = make(rng, start, n, rows, seed)
+        chunk.index = pd.RangeIndex(start, start + n)
+        yield chunk
+
+
+def write(schema, rows, out, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream the dataset to .csv, .parquet or (small) .xlsx; returns rows written."""
+    _, csv_index = SCHEMAS[schema]
+    ext = os.path.splitext(out)[1].lower()
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    chunks = generate(schema, rows, seed, chunksize)
+
+    if ext in (".xlsx", ".xls"):
+        # Excel can't be appended to, and caps out at ~1M rows anyway
+        if rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel holds at most {EXCEL_MAX_ROWS} rows; write .csv or .parquet instead")
+        pd.concat(chunks).to_excel(out, index=False)
+        return rows
+
+    if ext == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    arrow_schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(out, arrow_schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False))
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(out, mode="w" if i == 0 else "a", header=i == 0, index=csv_index)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic dataset in chunks.")
+    parser.add_argument("schema", choices=sorted(SCHEMAS))
+    parser.add_argument("--rows", type=lambda v: int(v.replace("_", "")), default=10_000)
+    parser.add_argument("--out", required=True, help=".csv, .parquet or .xlsx")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+    written = write(args.schema, args.rows, args.out, args.seed, args.chunksize)
+    print(f"Wrote {written} {args.schema} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
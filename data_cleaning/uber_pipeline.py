@@ -0,0 +1,244 @@
+"""
+Scripted version of the cleaning steps in uber.ipynb.
+
+The raw ncr_ride_bookings.csv is streamed in chunks, so nothing here needs
+the whole file in memory:
+
+  pass 1  running sums / counts (numeric means), null counts, and value
+          counters for the text columns that need a mode
+  pass 2  fill nulls with those statistics, normalize column names, parse
+          date / time, add year / month / day and write Parquet partitioned
+          by year and month (optionally also the flat newuber.csv)
+
+The statistics are kept in <out>/_state.json. Running the pipeline again on a
+new raw file only reads that file: its rows are folded into the saved
+statistics and written as new partition files (and appended to the --csv
+file), so a refresh costs time proportional to the new data. Rows written
+earlier keep the fill values that were current when they were written; use
+--rebuild to redo everything.
+
+Value counters are only kept for text columns with missing values, the ones
+that get a mode fill, so the state stays small for numeric and id-like
+columns. When a column first needs one (its first null, or a column that
+looked numeric turns out to hold text), that single column is re-read from
+this run's file and from the raw files of earlier runs, which must still be
+in place unchanged (else use --rebuild). The modes are then exactly those of
+all the raw rows seen so far.
+
+Usage:
+    python uber_pipeline.py ncr_ride_bookings.csv --out uber_parquet --csv newuber.csv
+    python uber_pipeline.py new_bookings.csv --out uber_parquet
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from collections import Counter
+
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 100_000
+
+STATE_FILE = "_state.json"
+# Bump when the layout of the state file changes
+STATE_VERSION = 3
+
+
+def normalize_name(name):
+    return name.strip().lower().replace(" ", "_")
+
+
+#############################
+# Pass 1: fill statistics
+#############################
+
+def empty_stats():
+    return {
+        "version": STATE_VERSION, "rows": 0, "numeric": {}, "text": [], "nulls": {},
+        "counts": {}, "sources": [],
+    }
+
+
+def update_stats(stats, chunk):
+    """
+    Fold one raw chunk, read as text (dtype=str), into the running sums,
+    null counts and the value counters kept so far.
+    """
+    stats["rows"] += len(chunk)
+    for col in chunk.columns:
+        values = chunk[col].dropna()
+        stats["nulls"][col] = stats["nulls"].get(col, 0) + len(chunk) - len(values)
+        if col in stats["counts"]:
+            stats["counts"][col].update(values.value_counts().to_dict())
+        if col in stats["text"]:
+            continue
+        numbers = pd.to_numeric(values, errors="coerce")
+        if numbers.notna().all():
+            acc = stats["numeric"].setdefault(col, {"sum": 0.0, "count": 0})
+            acc["sum"] += float(numbers.sum())
+            acc["count"] += int(numbers.count())
+        else:
+            # A column that is text in any chunk is text for the whole file
+            # (this is what read_csv would infer on the full file)
+            stats["numeric"].pop(col, None)
+            stats["text"].append(col)
+    return stats
+
+
+def count_values(paths, col, chunksize=DEFAULT_CHUNKSIZE):
+    """Value counts of raw column `col` over these files, reading only that column."""
+    counts = Counter()
+    for path in paths:
+        for chunk in pd.read_csv(path, usecols=lambda name: name == col, dtype=str, chunksize=chunksize):
+            if col in chunk:
+                counts.update(chunk[col].dropna().value_counts().to_dict())
+    return counts
+
+
+def start_counters(stats, raw_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Counters for text columns that now need a mode but have none yet,
+    rebuilt from every raw file seen so far (`raw_path` included).
+    """
+    needed = [col for col in stats["text"] if stats["nulls"].get(col) and col not in stats["counts"]]
+    if not needed:
+        return stats
+    earlier = []
+    for source in stats["sources"]:
+        path = source["path"]
+        if not os.path.exists(path) or source_id(path) != source["id"]:
+            raise SystemExit(
+                f"Counting {needed} needs {path} from an earlier run, which is gone or has "
+                "changed; rerun with --rebuild."
+            )
+        earlier.append(path)
+    for col in needed:
+        stats["counts"][col] = count_values(earlier + [raw_path], col, chunksize)
+    return stats
+
+
+def fill_values(stats):
+    """Means for numeric columns, modes for text columns."""
+    fills = {}
+    for col, acc in stats["numeric"].items():
+        if acc["count"]:
+            fills[col] = acc["sum"] / acc["count"]
+    for col in stats["text"]:
+        counts = stats["counts"].get(col)
+        if counts:
+            # Ties resolve to the smallest value, same as Series.mode()[0]
+            top = max(counts.values())
+            fills[col] = min(value for value, n in counts.items() if n == top)
+    return fills
+
+
+def save_state(stats, out_dir):
+    state = dict(stats)
+    state["counts"] = {col: dict(counts) for col, counts in stats["counts"].items()}
+    tmp = os.path.join(out_dir, STATE_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, os.path.join(out_dir, STATE_FILE))
+
+
+def load_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return empty_stats()
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION:
+        raise SystemExit(f"{path} was written by an older version of this script; rerun with --rebuild.")
+    state["counts"] = {col: Counter(counts) for col, counts in state["counts"].items()}
+    return state
+
+
+#############################
+# Pass 2: clean and write
+#############################
+
+def clean_chunk(chunk, fills):
+    chunk = chunk.fillna({col: value for col, value in fills.items() if col in chunk})
+    chunk = chunk.rename(columns=normalize_name)
+    chunk["date"] = pd.to_datetime(chunk["date"], errors="coerce")
+    chunk["time"] = pd.to_datetime(chunk["time"], format="%H:%M:%S", errors="coerce")
+    chunk["year"] = chunk["date"].dt.year
+    chunk["month"] = chunk["date"].dt.month
+    chunk["day"] = chunk["date"].dt.day
+    return chunk
+
+
+def write_partitions(chunk, out_dir, part_name):
+    """Write one cleaned chunk as a file inside each year=/month= folder."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dated = chunk.dropna(subset=["year", "month"])
+    for (year, month), part in dated.groupby(["year", "month"], sort=False):
+        folder = os.path.join(out_dir, f"year={int(year)}", f"month={int(month)}")
+        os.makedirs(folder, exist_ok=True)
+        table = pa.Table.from_pandas(part.drop(columns=["year", "month"]), preserve_index=False)
+        pq.write_table(table, os.path.join(folder, f"{part_name}.parquet"))
+    return len(dated)
+
+
+def source_id(path):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def run(raw_path, out_dir, csv_path=None, chunksize=DEFAULT_CHUNKSIZE, rebuild=False):
+    if rebuild and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    stats = load_state(out_dir)
+    src = source_id(raw_path)
+    if src in (source["id"] for source in stats["sources"]):
+        print(f"{raw_path} was already processed, nothing to do.")
+        return stats
+    rows_before = stats["rows"]
+
+    # Pass 1 (raw text, so counts match what read_csv gives a text column)
+    for chunk in pd.read_csv(raw_path, chunksize=chunksize, dtype=str):
+        update_stats(stats, chunk)
+    start_counters(stats, raw_path, chunksize)
+    fills = fill_values(stats)
+
+    # Pass 2
+    written = 0
+    # An incremental run adds its rows to the csv of the earlier runs
+    first = not (csv_path and rows_before and os.path.exists(csv_path))
+    # Text columns are read as text in every chunk, as read_csv would on the
+    # whole file, so chunks that look numeric still match their fill value
+    text_dtypes = {col: str for col in stats["text"]}
+    for i, chunk in enumerate(pd.read_csv(raw_path, chunksize=chunksize, dtype=text_dtypes)):
+        cleaned = clean_chunk(chunk, fills)
+        written += write_partitions(cleaned, out_dir, f"{src}-{i:05d}")
+        if csv_path:
+            cleaned.index += rows_before   # row numbers continue across runs
+            cleaned.to_csv(csv_path, mode="w" if first else "a", header=first)
+        first = False
+
+    stats["sources"].append({"id": src, "path": os.path.abspath(raw_path)})
+    save_state(stats, out_dir)
+    print(f"Wrote {written} rows from {raw_path} to {out_dir} ({stats['rows']} rows seen in total).")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the raw Uber bookings file in chunks.")
+    parser.add_argument("raw", help="raw bookings csv (ncr_ride_bookings.csv or a newer extract)")
+    parser.add_argument("--out", default="uber_parquet", help="Parquet output folder")
+    parser.add_argument("--csv", help="also write the cleaned rows to a flat csv (appended to on later runs)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--rebuild", action="store_true", help="drop previous output and state first")
+    args = parser.parse_args(argv)
+    run(args.raw, args.out, csv_path=args.csv, chunksize=args.chunksize, rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    main()